@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import subprocess
+import zipfile
+import zlib
+
+import pytest
+
+from universum import __main__
+from universum.modules import deferred_deletion
+from . import utils
+
+
+@pytest.fixture(name="environment")
+def fixture_environment(tmpdir):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    source_dir = tmpdir.mkdir("sources")
+    source_dir.join("readme.txt").write("Some text")
+    env.settings.LocalMainVcs.source_dir = str(source_dir)
+    yield env
+
+
+def write_config(env, config):
+    env.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = {config}
+""")
+
+
+def test_background_artifacts(environment, stdout_checker):
+    environment.settings.ArtifactCollector.background_artifacts = True
+    write_config(environment, """Configuration([
+    Step(name="Create directory", command=["bash", "-c", "mkdir -p out/sub && echo text > out/sub/file.txt"],
+         artifacts="out"),
+    Step(name="Create file", command=["bash", "-c", "echo text > single.txt"], artifacts="single.txt"),
+    Step(name="Fail", command=["bash", "-c", "echo text > failed.txt; exit 1"], artifacts="failed.txt"),
+    Step(name="Missing", command=["ls"], artifacts="missing.txt")
+])""")
+
+    assert __main__.run(environment.settings) == 0
+    stdout_checker.assert_has_calls_with_param("Collecting 'out' in background")
+    stdout_checker.assert_has_calls_with_param("Collecting 'single.txt' in background")
+    stdout_checker.assert_absent_calls_with_param("Collecting 'failed.txt' in background")
+    stdout_checker.assert_has_calls_with_param("No artifacts found!")
+
+    with zipfile.ZipFile(str(environment.artifact_dir.join("out.zip"))) as archive:
+        assert archive.read("sub/file.txt") == b"text\n"
+    assert environment.artifact_dir.join("single.txt").read() == "text\n"
+    assert environment.artifact_dir.join("failed.txt").read() == "text\n"
+    assert not os.path.exists(str(environment.artifact_dir.join("missing.txt")))
+
+
+@pytest.mark.parametrize("no_archive", [False, True], ids=["archive", "no_archive"])
+def test_artifact_manifest(environment, no_archive):
+    environment.settings.ArtifactCollector.artifact_manifest = True
+    environment.settings.ArtifactCollector.manifest_fast_hash = True
+    environment.settings.ArtifactCollector.no_archive = no_archive
+    write_config(environment, """Configuration([
+    Step(name="Create directory", command=["bash", "-c", "mkdir -p out/sub && echo text > out/sub/file.txt"],
+         artifacts="out"),
+    Step(name="Create file", command=["bash", "-c", "echo text > single.txt"], report_artifacts="single.txt")
+])""")
+
+    assert __main__.run(environment.settings) == 0
+    with open(str(environment.artifact_dir.join("ARTIFACTS_MANIFEST.json")), encoding="utf-8") as f:
+        manifest = json.load(f)["artifacts"]
+
+    text_checksum = {"size": 5, "sha256": hashlib.sha256(b"text\n").hexdigest(), "crc32": "%08x" % zlib.crc32(b"text\n")}
+    directory_name = "out" if no_archive else "out.zip"
+    assert manifest[directory_name]["files"] == {os.path.join("sub", "file.txt"): text_checksum}
+    assert manifest["single.txt"]["files"] == {"single.txt": text_checksum}
+
+
+def test_copied_directory_links(environment):
+    # Linked directories are copied as directories when artifacts are not archived
+    environment.settings.ArtifactCollector.artifact_manifest = True
+    environment.settings.ArtifactCollector.no_archive = True
+    write_config(environment, """Configuration([
+    Step(name="Create directory", command=["bash", "-c",
+         "mkdir -p out shared && echo text > shared/file.txt && ln -s ../shared out/linked"], artifacts="out")
+])""")
+
+    assert __main__.run(environment.settings) == 0
+    copied = environment.artifact_dir.join("out", "linked")
+    assert not copied.islink() and copied.join("file.txt").read() == "text\n"
+    with open(str(environment.artifact_dir.join("ARTIFACTS_MANIFEST.json")), encoding="utf-8") as f:
+        assert list(json.load(f)["artifacts"]["out"]["files"]) == [os.path.join("linked", "file.txt")]
+
+
+@pytest.mark.parametrize("compress_all", [False, True], ids=["skip_compressed", "compress_all"])
+def test_incompressible_artifacts(environment, stdout_checker, compress_all):
+    environment.settings.ArtifactCollector.compress_all = compress_all
+    write_config(environment, """Configuration([
+    Step(name="Create files", command=["bash", "-c",
+         "mkdir out && head -c 100000 /dev/urandom > out/random.bin && echo text > out/data.gz "
+         "&& yes text | head -n 10000 > out/text.txt"], artifacts="out")
+])""")
+
+    assert __main__.run(environment.settings) == 0
+    with zipfile.ZipFile(str(environment.artifact_dir.join("out.zip"))) as archive:
+        stored = zipfile.ZIP_DEFLATED if compress_all else zipfile.ZIP_STORED
+        assert archive.getinfo("random.bin").compress_type == stored
+        assert archive.getinfo("data.gz").compress_type == stored
+        assert archive.getinfo("text.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read("data.gz") == b"text\n"
+
+    if compress_all:
+        stdout_checker.assert_absent_calls_with_param("stored to archives without compression")
+    else:
+        stdout_checker.assert_has_calls_with_param("2 already compressed file(s) (100005 bytes) stored to archives "
+                                                   "without compression, estimated time saved")
+
+
+@pytest.fixture(name="deletion_processes")
+def fixture_deletion_processes(monkeypatch):
+    processes = []
+    original_popen = subprocess.Popen
+
+    def popen(*args, **kwargs):
+        process = original_popen(*args, **kwargs)  # pylint: disable = consider-using-with
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(deferred_deletion.subprocess, "Popen", popen)
+    yield processes
+    for process in processes:
+        process.wait(timeout=60)
+
+
+def test_deferred_deletion(environment, tmpdir, deletion_processes):
+    trash_dir = tmpdir.mkdir("trash")
+    environment.settings.DeferredDeletion.deferred_deletion = True
+    environment.settings.DeferredDeletion.trash_dir = str(trash_dir)
+    trash_dir.join("foreign.txt").write("text")
+    deletion_dir = trash_dir.mkdir(deferred_deletion.DELETION_DIRECTORY)
+    deletion_dir.join(deferred_deletion.MARKER_FILE).write("")
+    deletion_dir.join("foreign.txt").write("text")
+    leftover = deletion_dir.mkdir("leftover." + "0" * 32)
+    leftover.join("file.txt").write("text")
+
+    tmpdir.join("sources").mkdir("out").join("old.txt").write("text")
+    write_config(environment, """Configuration([
+    Step(name="Create directory", command=["bash", "-c", "mkdir -p out && echo text > out/new.txt"],
+         artifacts="out", artifact_prebuild_clean=True)
+])""")
+
+    assert __main__.run(environment.settings) == 0
+    with zipfile.ZipFile(str(environment.artifact_dir.join("out.zip"))) as archive:
+        assert archive.namelist() == ["./", "new.txt"]
+
+    # Both the cleaned artifact and the copied sources are deleted in background, and nothing else is
+    assert deletion_processes
+    for process in deletion_processes:
+        process.wait(timeout=60)
+    assert sorted(entry.basename for entry in trash_dir.listdir()) == ["foreign.txt",
+                                                                        deferred_deletion.DELETION_DIRECTORY]
+    assert sorted(entry.basename for entry in deletion_dir.listdir()) == [deferred_deletion.MARKER_FILE,
+                                                                           "foreign.txt"]
+
+
+def test_deferred_deletion_foreign_directory(environment, tmpdir, deletion_processes):
+    trash_dir = tmpdir.mkdir("trash")
+    environment.settings.DeferredDeletion.deferred_deletion = True
+    environment.settings.DeferredDeletion.trash_dir = str(trash_dir)
+    foreign = trash_dir.mkdir(deferred_deletion.DELETION_DIRECTORY).mkdir("foreign." + "0" * 32)
+    foreign.join("file.txt").write("text")
+
+    tmpdir.join("sources").mkdir("out").join("old.txt").write("text")
+    write_config(environment, """Configuration([
+    Step(name="Create directory", command=["bash", "-c", "mkdir -p out && echo text > out/new.txt"],
+         artifacts="out", artifact_prebuild_clean=True)
+])""")
+
+    # Directory without the marker is not used, so the files are deleted in place
+    assert __main__.run(environment.settings) == 0
+    assert not deletion_processes
+    assert foreign.join("file.txt").check()
+    with zipfile.ZipFile(str(environment.artifact_dir.join("out.zip"))) as archive:
+        assert archive.namelist() == ["./", "new.txt"]
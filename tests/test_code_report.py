@@ -1,12 +1,28 @@
+import difflib
+import filecmp
 import inspect
+import json
 import os
+import pathlib
+import random
 import re
+import shutil
+import subprocess
+import sys
+import time
+from unittest import mock
 from typing import List
 
 import pytest
 
 from universum import __main__
+from universum.analyzers import scan_build_report, uncrustify
+from universum.analyzers.sarif_report import parse_sarif_file, sarif_report_output_parser
+from universum.lib import json_stream
+from universum.modules import reporter
+from universum.modules.code_report_collector import ChangedLinesIndex, CodeReportCollector
 from . import utils
+from .git_utils import GitEnvironment
 from .utils import python, python_version
 
 
@@ -293,3 +309,633 @@ configs = Configuration([Step(critical=True)]) * Configuration([
 
     assert res == 0
     stdout_checker.assert_absent_calls_with_param("${CODE_REPORT_FILE}")
+
+
+def test_incremental_code_report(tmpdir, monkeypatch, stdout_checker):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    env.settings.LocalMainVcs.source_dir = str(tmpdir)
+    env.settings.Main.no_diff = True
+    monkeypatch.setenv("PYTHONPATH", os.getcwd())
+
+    reported = tmpdir.join("reported.txt")
+    waited = tmpdir.join("waited.txt")
+    original_code_report = reporter.Reporter.code_report
+
+    def code_report(self, path, message):
+        reported.write(path + "\n", mode="a")
+        original_code_report(self, path, message)
+
+    def report_code_report_comments(self):
+        raise RuntimeError("review is not available")
+
+    monkeypatch.setattr(reporter.Reporter, "code_report", code_report)
+    monkeypatch.setattr(reporter.Reporter, "report_code_report_comments", report_code_report_comments)
+    tmpdir.join("source.py").write('"Docstring."\nimport os\n')
+    # Analyzer fails as it finds issues; the second step only succeeds if these issues are processed
+    # while the build is still running
+    env.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([
+    Step(name="Report", code_report=True,
+         command=[{python()!r}, "-m", "universum.analyzers.pylint", "--python-version", {python_version()!r},
+                  "--files", "source.py", "--result-file", "${{CODE_REPORT_FILE}}"]),
+    Step(name="Wait", command=["bash", "-c", "for i in $(seq 100); do [ -f {reported} ] && break; sleep 0.1; done; "
+                                             "cp {reported} {waited}"]),
+])
+""")
+
+    assert __main__.run(env.settings) == 0
+    assert waited.exists()
+    # Issues are counted and merged even though they failed to be sent
+    stdout_checker.assert_has_calls_with_param("Found 1 issues")
+    stdout_checker.assert_has_calls_with_param("Failed to send issues of 'Report.json' to code review system: "
+                                               "review is not available")
+    assert reported.read() == "source.py\n"
+    merged = json.loads(tmpdir.join("artifacts", "Static_analysis_report.json").read())
+    assert merged["files"]["source.py"][0]["symbol"] == "unused-import"
+
+
+@pytest.mark.parametrize("concurrent", [False, True], ids=["after_build", "concurrent"])
+def test_git_code_report_diff(tmpdir, git_client, stdout_checker, concurrent):
+    with git_client.repo.config_writer() as configurator:
+        configurator.set_value("user", "name", "Testing user")
+        configurator.set_value("user", "email", "some@email.com")
+    source_lines = [f"variable_{number} = {number}\n" for number in range(10)]
+    source_file = git_client.root_directory.join("source.py")
+    git_client.repo.git.checkout(git_client.server.target_branch)
+    source_file.write("".join(source_lines))
+    git_client.repo.index.add([str(source_file)])
+    git_client.repo.index.commit("Add source")
+    git_client.repo.git.push("origin", git_client.server.target_branch)
+    git_client.repo.git.checkout("-b", "change")
+    source_file.write("".join(["import os\n", "variable = os.name\n"] + source_lines))
+    git_client.repo.index.add([str(source_file)])
+    change = str(git_client.repo.index.commit("Change source"))
+    git_client.repo.git.push("origin", "change")
+
+    env = GitEnvironment(git_client, tmpdir, "main")
+    env.settings.GitMainVcs.cherrypick_id = [[change]]
+    env.settings.Main.concurrent_code_report = concurrent
+    runs = tmpdir.join("runs.txt")
+    analyzer = tmpdir.join("analyzer.py")
+    analyzer.write("""
+import json
+import os
+import sys
+
+with open("source.py") as f:
+    lines = f.readlines()
+with open(sys.argv[2], "a") as f:
+    f.write(" ".join([os.getcwd(), str(len(lines)), os.environ.get("UNIVERSUM_ONLY_CHANGED", "")]) + "\\n")
+# 'variable_4' is an issue since before the change, and 'variable_8' becomes an issue because of the change
+names = ["variable", "variable_4"] + (["variable_8"] if "import os\\n" in lines else [])
+issues = [{"path": "source.py", "line": number, "symbol": "invalid-name", "message": line.split()[0]}
+          for number, line in enumerate(lines, 1) if line.split()[0] in names]
+with open(sys.argv[1], "w") as f:
+    json.dump(issues, f)
+""")
+    env.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Report", code_report=True,
+                              command=[{sys.executable!r}, {str(analyzer)!r}, "${{CODE_REPORT_FILE}}", {str(runs)!r}])])
+""")
+
+    assert __main__.run(env.settings) == 0
+    stdout_checker.assert_absent_calls_with_param("Diff calculation for code report is skipped")
+    # Issue in the changed line is reported, and of the other ones only the issue introduced by the change
+    stdout_checker.assert_has_calls_with_param("1 of 3 issues are skipped as not related to changed lines")
+    stdout_checker.assert_has_calls_with_param("1 issues outside changed lines are reported")
+
+    if concurrent:
+        stdout_checker.assert_has_calls_with_param("This step is marked to be executed in background")
+        stdout_checker.assert_absent_calls_with_param("Revert repository")
+
+    # Step is repeated on the original sources, checked out to a separate worktree removed in the end
+    runs_by_directory = {line.split()[0]: line.split() for line in runs.read().splitlines()}
+    assert runs_by_directory.pop(env.settings.ProjectDirectory.project_root) == \
+        [env.settings.ProjectDirectory.project_root, "12"]
+    [base_run] = runs_by_directory.values()
+    assert base_run[1] == "10"
+    assert not os.path.exists(base_run[0])
+    assert base_run[2].endswith("file_diff.json")
+
+    # Worktree of the run that is not finalized is removed by the next run
+    def run_again(directory, no_finalize):
+        rerun_env = GitEnvironment(git_client, tmpdir.mkdir(directory), "main")
+        rerun_env.settings.GitMainVcs.cherrypick_id = [[change]]
+        rerun_env.settings.Main.no_finalize = no_finalize
+        rerun_env.settings.ProjectDirectory.project_root = env.settings.ProjectDirectory.project_root
+        rerun_env.configs_file.write(env.configs_file.read())
+        assert __main__.run(rerun_env.settings) == 0
+
+    run_again("not_finalized", True)
+    [left_worktree] = [line.split()[0] for line in runs.read().splitlines()[2:]
+                       if line.split()[0] != env.settings.ProjectDirectory.project_root]
+    assert os.path.exists(left_worktree)
+    shutil.rmtree(env.settings.ProjectDirectory.project_root)
+    run_again("next", False)
+    stdout_checker.assert_has_calls_with_param(f"Removing worktree '{left_worktree}' left by previous run...")
+    assert not os.path.exists(left_worktree)
+
+
+@pytest.mark.parametrize("concurrent", [False, True], ids=["after_build", "concurrent"])
+def test_git_code_report_without_change(tmpdir, git_client, stdout_checker, concurrent):
+    # Nothing is cherry-picked, so the diff is empty and all issues are reported, as with '--no-diff'
+    env = GitEnvironment(git_client, tmpdir, "main")
+    env.settings.Main.concurrent_code_report = concurrent
+    tmpdir.join("found.json").write(json.dumps([
+        {"path": "source.py", "line": 2, "symbol": "invalid-name", "message": "Name"}]))
+    env.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Report", code_report=True,
+                              command=["cp", {str(tmpdir.join("found.json"))!r}, "${{CODE_REPORT_FILE}}"])])
+""")
+
+    assert __main__.run(env.settings) == 0
+    stdout_checker.assert_has_calls_with_param("Code report steps are not repeated on original sources")
+    stdout_checker.assert_absent_calls_with_param("are skipped as not related to changed lines")
+    stdout_checker.assert_has_calls_with_param("Found 1 issues")
+    stdout_checker.assert_absent_calls_with_param("This step is marked to be executed in background")
+
+
+def test_changed_lines_index(tmpdir):
+    original = tmpdir.join("original.py")
+    original.write("".join(f"line {number}\n" for number in range(1, 11)))
+    changed = tmpdir.mkdir("new_temp").join("changed.py")
+    changed.write("".join(f"line {number}\n" for number in [1, 2, 3, "new", 4, 5, 6, 7, "modified", 9, 10]))
+    added = tmpdir.join("new_temp", "added.py")
+    added.write("print()\n")
+
+    index = ChangedLinesIndex(str(tmpdir), [
+        ("changed.py", str(changed), str(original)),
+        ("added.py", str(added), None),
+        (None, None, str(tmpdir.join("deleted.py"))),
+    ])
+    changed_lines = [line for line in range(1, 12) if index.is_changed("changed.py", line)]
+    assert changed_lines == [4, 9]
+    assert index.is_changed(str(tmpdir.join("changed.py")), "9")
+    assert index.is_changed("./added.py", 100)
+    assert not index.is_changed("unchanged.py", 1)
+    assert not index.is_changed("deleted.py", 1)
+
+
+@pytest.mark.parametrize('analyzer', ['pylint', 'mypy'])
+def test_analyzer_jobs(tmpdir, analyzer):
+    package = tmpdir.mkdir("package")
+    package.join("__init__.py").write('"Docstring."\n')
+    for name in ["first", "second", "third"]:
+        package.join(f"{name}.py").write(source_code_python.replace(': str', ': int') + '\n')
+    tmpdir.join("script.py").write(source_code_python.replace(': str', ': int') + '\n')
+
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+    results = []
+    for jobs in ["1", "3"]:
+        result_file = tmpdir.join(f"result_{jobs}.json")
+        subprocess.run([python(), "-m", f"universum.analyzers.{analyzer}", "--python-version", python_version(),
+                        "--files", "package", "script.py", "--result-file", str(result_file), "--jobs", jobs],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        results.append(json.loads(result_file.read()))
+    assert results[0]
+    assert sorted(results[0], key=lambda issue: (issue["path"], issue["line"], issue["symbol"], issue["message"])) \
+        == results[1]
+
+
+def test_mypy_daemon(tmpdir):
+    tmpdir.join("first.py").write(source_code_python.replace(': str', ': int'))
+    tmpdir.join("second.py").write(source_code_python)
+    daemon_dir = tmpdir.join("daemon")
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def run_mypy(*extra_args, files=("first.py", "second.py")):
+        result_file = tmpdir.join("result.json")
+        subprocess.run([python(), "-m", "universum.analyzers.mypy", "--python-version", python_version(),
+                        "--files", *files, "--result-file", str(result_file), *extra_args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        return json.loads(result_file.read())
+
+    expected = run_mypy()
+    assert expected
+    try:
+        assert run_mypy("--daemon", "--daemon-dir", str(daemon_dir)) == expected
+        assert len(daemon_dir.listdir()) == 1
+        # The same daemon checks the files again
+        tmpdir.join("second.py").write(source_code_python.replace(': str', ': int'))
+        result = run_mypy("--daemon", "--daemon-dir", str(daemon_dir))
+        assert len(result) == 2 * len(expected)
+        assert result == run_mypy()
+        assert len(daemon_dir.listdir()) == 1
+        # Checking a part of the files does not start another daemon
+        assert run_mypy("--daemon", "--daemon-dir", str(daemon_dir), files=["first.py"]) == \
+            run_mypy(files=["first.py"])
+        assert len(daemon_dir.listdir()) == 1
+    finally:
+        for status_file in daemon_dir.listdir():
+            subprocess.run([python(), "-m", "mypy.dmypy", "--status-file", str(status_file), "stop"],
+                           cwd=str(tmpdir), capture_output=True, check=False)
+
+
+def test_analyzer_file_selection(tmpdir):
+    tmpdir.mkdir(".git")
+    tmpdir.join(".gitignore").write("build/\ngenerated_*.py\n")
+    package = tmpdir.mkdir("package")
+    for name in ["first.py", "second.py", "generated_code.py"]:
+        package.join(name).write(source_code_python)
+    tmpdir.mkdir("build").join("built.py").write(source_code_python)
+    tmpdir.join("notes.txt").write("Not a Python file\n")
+    tmpdir.join("diff.json").write(json.dumps([
+        {"action": "modify", "repo_path": "package/second.py", "local_path": str(package.join("second.py"))},
+        {"action": "add", "repo_path": "notes.txt", "local_path": str(tmpdir.join("notes.txt"))},
+        {"action": "delete", "repo_path": "package/third.py", "local_path": str(package.join("third.py"))},
+    ]))
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def analyzed_files(*args):
+        result_file = tmpdir.join("result.json")
+        subprocess.run([python(), "-m", "universum.analyzers.pylint", "--python-version", python_version(),
+                        "--result-file", str(result_file), *args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        return sorted({issue["path"] for issue in json.loads(result_file.read())})
+
+    assert analyzed_files("--files", "**/*.py") == \
+        ["build/built.py", "package/first.py", "package/generated_code.py", "package/second.py"]
+    assert analyzed_files("--files", "**/*.py", "--gitignore") == ["package/first.py", "package/second.py"]
+    assert analyzed_files("--files", "package", "build", "--gitignore") == ["package/first.py", "package/second.py"]
+    assert analyzed_files("--files", ".", "--only-changed", "diff.json") == ["package/second.py"]
+
+    # No files are left to analyze, but empty report is still written
+    tmpdir.join("unrelated_diff.json").write(json.dumps([
+        {"action": "add", "repo_path": "notes.txt", "local_path": str(tmpdir.join("notes.txt"))},
+    ]))
+    for analyzer in ["pylint", "mypy"]:
+        result_file = tmpdir.join(f"{analyzer}.json")
+        process = subprocess.run([python(), "-m", f"universum.analyzers.{analyzer}", "--python-version",
+                                  python_version(), "--result-file", str(result_file), "--files", ".",
+                                  "--only-changed", "unrelated_diff.json"],
+                                 cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        assert process.returncode == 0, process.stderr
+        assert json.loads(result_file.read()) == []
+
+
+fake_clang_tidy = """#!{python}
+import os
+import re
+import sys
+
+if sys.argv[1] == "--version":
+    print("Fake clang-tidy version 1.0")
+    sys.exit(0)
+source = os.path.abspath(sys.argv[-1])
+with open("calls.log", "a") as log:
+    log.write(os.path.basename(source) + "\\n")
+for path in [source] + [os.path.join(os.path.dirname(source), name)
+                        for name in re.findall(r'#include "(.+)"', open(source).read())]:
+    for number, line in enumerate(open(path), start=1):
+        if "magic" in line:
+            print(f"{{path}}:{{number}}:5: warning: magic number used [readability-magic-numbers]")
+            print(line.rstrip())
+            print("    ^")
+"""
+
+
+def test_clang_tidy(tmpdir):
+    clang_tidy = tmpdir.join("clang-tidy")
+    clang_tidy.write(fake_clang_tidy.format(python=sys.executable))
+    clang_tidy.chmod(0o755)
+    tmpdir.join("common.h").write("int common = 42;  // magic\n")
+    tmpdir.join("other.h").write("int other;\n")
+    tmpdir.join("first.c").write('#include "common.h"\nint first = 1;  // magic\n')
+    tmpdir.join("second.c").write('#include "common.h"\n#include "other.h"\n')
+    tmpdir.join("third.c").write('#include "other.h"\nint third = 3;  // magic\n')
+    tmpdir.join("compile_commands.json").write(json.dumps([
+        {"directory": str(tmpdir), "file": name, "command": f"cc -I. -c {name}"}
+        for name in ["first.c", "second.c", "third.c"]
+    ]))
+    cache_dir = tmpdir.join("cache")
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def run_clang_tidy(*extra_args):
+        result_file = tmpdir.join("result.json")
+        tmpdir.join("calls.log").write("")
+        subprocess.run([python(), "-m", "universum.analyzers.clang_tidy", "--clang-tidy", str(clang_tidy),
+                        "--files", "*.c", "--result-file", str(result_file), *extra_args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        calls = sorted(tmpdir.join("calls.log").read().split())
+        return [(issue["path"], issue["line"]) for issue in json.loads(result_file.read())], calls
+
+    expected = [("common.h", 1), ("first.c", 2), ("third.c", 2)]
+    assert run_clang_tidy() == (expected, ["first.c", "second.c", "third.c"])
+    assert run_clang_tidy("--jobs", "3") == (expected, ["first.c", "second.c", "third.c"])
+
+    assert run_clang_tidy("--cache-dir", str(cache_dir)) == (expected, ["first.c", "second.c", "third.c"])
+    assert run_clang_tidy("--cache-dir", str(cache_dir), "--jobs", "3") == (expected, [])
+
+    # Only the translation units including the changed header are checked again
+    tmpdir.join("other.h").write("int other = 7;  // magic\n")
+    assert run_clang_tidy("--cache-dir", str(cache_dir)) == \
+        (expected[:2] + [("other.h", 1)] + expected[2:], ["second.c", "third.c"])
+
+
+def test_compiler_warnings(tmpdir):
+    # Log is bigger than the chunk the analyzer reads at once, so some messages are split between chunks
+    build_line = "[ 50%] Building CXX object CMakeFiles/project.dir/src/unit.cpp.o\n"
+    warning = f"{tmpdir}/include/common.h:12:9: warning: unused variable 'x' [-Wunused-variable]\n"
+    with open(tmpdir.join("build.log"), "w", encoding="utf-8") as log:
+        for unit in range(50000):
+            log.write(build_line)
+            log.write(warning)
+            log.write(f"src/unit{unit % 3}.cpp:{unit % 7 + 1}: warning: comparison is always true\n")
+    tmpdir.join("msvc.log").write("1>src\\main.cpp(42,5): warning C4996: 'strcpy': This function may be unsafe. "
+                                  "[project.vcxproj]\n" + warning)
+    # Build tool prefixes the lines with the stream name, and system headers are in a path with parentheses
+    tmpdir.join("prefixed.log").write("stderr: src/other.c:3:1: warning: no newline at end of file [-Wnewline-eof]\n"
+                                      "stderr: 2>C:\\Program Files (x86)\\Windows Kits\\ucrt\\string.h(130): "
+                                      "warning C4995: 'strcat': name was marked as #pragma deprecated\n")
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def run_analyzer(*args):
+        result_file = tmpdir.join("result.json")
+        subprocess.run([python(), "-m", "universum.analyzers.compiler_warnings",
+                        "--result-file", str(result_file), *args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        return [(issue["path"], issue["line"], issue["symbol"]) for issue in json.loads(result_file.read())]
+
+    issues = run_analyzer("--files", "build.log")
+    assert issues[0] == ("include/common.h", 12, "-Wunused-variable")
+    assert sorted(issues[1:]) == [(f"src/unit{unit}.cpp", line, "compiler warning")
+                                  for unit in range(3) for line in range(1, 8)]
+    assert run_analyzer("--files", "build.log", "msvc.log", "--jobs", "2") == \
+        issues + [("src\\main.cpp", 42, "C4996")]
+    assert run_analyzer("--files", "prefixed.log") == \
+        [("C:\\Program Files (x86)\\Windows Kits\\ucrt\\string.h", 130, "C4995"),
+         ("src/other.c", 3, "-Wnewline-eof")]
+
+
+def test_analyzer_batch(tmpdir):
+    tmpdir.mkdir(".git")
+    tmpdir.join(".gitignore").write("generated_*.py\n")
+    package = tmpdir.mkdir("package")
+    package.join("__init__.py").write("")
+    package.join("first.py").write(source_code_python + 'value: int = "text"\n')
+    package.join("generated_code.py").write(source_code_python)
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def run_module(module, *args):
+        return subprocess.run([python(), "-m", module, *args], cwd=str(tmpdir), env=environment,
+                              capture_output=True, check=False, universal_newlines=True)
+
+    def read_result(name):
+        return json.loads(tmpdir.join(name).read())
+
+    common_args = ["--files", "**/*.py", "--gitignore"]
+    run_module("universum.analyzers.pylint", *common_args, "--python-version", python_version(),
+               "--result-file", "pylint_single.json")
+    run_module("universum.analyzers.mypy", *common_args, "--python-version", python_version(),
+               "--result-file", "mypy_single.json")
+    assert read_result("pylint_single.json") and read_result("mypy_single.json")
+
+    process = run_module("universum.analyzers.batch", *common_args,
+                         "--analyzer", f"pylint --python-version {python_version()} --result-file pylint.json",
+                         "--analyzer", f"mypy --python-version {python_version()} --result-file mypy.json")
+    assert process.returncode == 1, process.stderr
+    assert read_result("pylint.json") == read_result("pylint_single.json")
+    assert read_result("mypy.json") == read_result("mypy_single.json")
+    assert all(issue["path"] == "package/first.py" for issue in read_result("pylint.json"))
+
+    # Failure of one analyzer does not prevent the others from writing their results
+    tmpdir.join("mypy.json").remove()
+    process = run_module("universum.analyzers.batch", *common_args,
+                         "--analyzer", "unknown_analyzer --result-file unknown.json",
+                         "--analyzer", f"mypy --python-version {python_version()} --result-file mypy.json")
+    assert process.returncode == 2
+    assert "unknown_analyzer" in process.stderr
+    assert not tmpdir.join("mypy.json").exists()
+
+    process = run_module("universum.analyzers.batch", *common_args,
+                         "--analyzer", "mypy --result-file mypy.json --config-file missing.ini",
+                         "--analyzer", f"pylint --python-version {python_version()} --result-file pylint.json")
+    assert process.returncode == 2
+    assert "Analyzer 'mypy' failed" in process.stderr
+    assert read_result("pylint.json") == read_result("pylint_single.json")
+
+
+def test_analyzer_base_run_environment(tmpdir):
+    # Universum passes the file diff and the persistent cache to the steps repeated on the original sources
+    for name in ["first.py", "second.py"]:
+        tmpdir.join(name).write(source_code_python)
+    tmpdir.join("diff.json").write(json.dumps([
+        {"action": "modify", "repo_path": "second.py", "local_path": str(tmpdir.join("second.py"))},
+    ]))
+    cache_dir = tmpdir.join("cache")
+    environment = dict(os.environ, PYTHONPATH=os.getcwd(), UNIVERSUM_ONLY_CHANGED=str(tmpdir.join("diff.json")),
+                       UNIVERSUM_CODE_REPORT_CACHE=str(cache_dir))
+    result_file = tmpdir.join("result.json")
+    subprocess.run([python(), "-m", "universum.analyzers.pylint", "--python-version", python_version(),
+                    "--files", "*.py", "--result-file", str(result_file)],
+                   cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+    assert {issue["path"] for issue in json.loads(result_file.read())} == {"second.py"}
+    assert len([entry for entry in cache_dir.visit() if entry.check(file=True)]) == 1
+
+    # Change only adds and deletes files, so none of the original sources is checked
+    tmpdir.join("diff.json").write(json.dumps(CodeReportCollector.get_base_file_diff(
+        str(tmpdir), [("third.py", str(tmpdir.join("third.py")), None), (None, None, str(tmpdir.join("first.py")))])))
+    for analyzer in ["pylint", "mypy"]:
+        result_file = tmpdir.join(f"{analyzer}.json")
+        process = subprocess.run([python(), "-m", f"universum.analyzers.{analyzer}", "--python-version",
+                                  python_version(), "--files", "*.py", "--result-file", str(result_file)],
+                                 cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        assert process.returncode == 0, process.stderr
+        assert json.loads(result_file.read()) == []
+
+
+def test_pylint_cache(tmpdir):
+    tmpdir.join("first.py").write(source_code_python + '\n')
+    tmpdir.join("second.py").write(source_code_python)
+    cache_dir = tmpdir.join("cache")
+    environment = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    def run_pylint(*extra_args):
+        result_file = tmpdir.join("result.json")
+        subprocess.run([python(), "-m", "universum.analyzers.pylint", "--python-version", python_version(),
+                        "--files", "first.py", "second.py", "--result-file", str(result_file), *extra_args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        return json.loads(result_file.read())
+
+    def sort_issues(issues):
+        return sorted(issues, key=lambda issue: (issue["path"], issue["line"], issue["symbol"], issue["message"]))
+
+    def cache_entries():
+        return [entry for entry in cache_dir.visit() if entry.check(file=True)]
+
+    assert run_pylint("--cache-dir", str(cache_dir)) == sort_issues(run_pylint())
+    assert len(cache_entries()) == 2
+
+    tmpdir.join("second.py").write(source_code_python + '\n')
+    cached_result = run_pylint("--cache-dir", str(cache_dir))
+    assert cached_result == sort_issues(run_pylint())
+    assert {issue["path"] for issue in cached_result} == {"first.py", "second.py"}
+    assert len(cache_entries()) == 3
+
+    # Results of an unchanged module are not reused when a module it imports is changed
+    tmpdir.join("first.py").write(source_code_python + '\nfrom second import NAME\n')
+    tmpdir.join("second.py").write(source_code_python + '\nNAME = 1\n')
+    run_pylint("--cache-dir", str(cache_dir))
+    tmpdir.join("second.py").write(source_code_python)
+    cached_result = run_pylint("--cache-dir", str(cache_dir))
+    assert cached_result == sort_issues(run_pylint())
+    assert "no-name-in-module" in {issue["symbol"] for issue in cached_result}
+
+    run_pylint("--cache-dir", str(cache_dir), "--cache-size", "0")
+    assert not cache_entries()
+
+
+def write_json_array(stream, items):
+    # Same output as 'json.dump(list(items), stream, indent=4)' for flat objects, without the slow indenting encoder
+    encoder = json.JSONEncoder(separators=(",\n        ", ": "))
+    count = 0
+    for item in items:
+        stream.write(("[\n" if not count else ",\n") + "    {\n        " + encoder.encode(item)[1:-1] + "\n    }")
+        count += 1
+    stream.write("\n]" if count else "[]")
+    return count
+
+
+def test_report_streaming_benchmark(tmpdir):
+    issue_count = 1000000
+    report_file = tmpdir.join("report.json")
+    with open(str(report_file), "w", encoding="utf-8") as f:
+        write_json_array(f, ({"path": f"src/module_{number % 1000}.py", "line": number,
+                              "symbol": "invalid-name", "message": f"Issue number {number}"}
+                             for number in range(issue_count)))
+
+    max_buffer_size = 0
+
+    def read_issues(reader):
+        nonlocal max_buffer_size
+        for issue in reader:
+            max_buffer_size = max(max_buffer_size, len(reader.buffer))
+            yield issue
+
+    started = time.monotonic()
+    with open(str(report_file), encoding="utf-8") as source, \
+            open(str(tmpdir.join("copy.json")), "w", encoding="utf-8") as destination:
+        assert write_json_array(destination, read_issues(json_stream.JsonArrayReader(source))) == issue_count
+    print(f"Streamed {issue_count} issues in {time.monotonic() - started:.1f} s")
+
+    assert max_buffer_size <= 2 * 64 * 1024
+    assert filecmp.cmp(str(report_file), str(tmpdir.join("copy.json")), shallow=False)
+
+
+def generate_c_source(function_count):
+    lines = []
+    for number in range(function_count):
+        lines += [f"int function_{number}(int x) {{\n", "    int y = x * 2;\n", "    if (y > 10) {\n",
+                  "        return y;\n", "    }\n", "    return 0;\n", "}\n", "\n"]
+    return lines
+
+
+def test_uncrustify_diff_benchmark():
+    random.seed(0)
+    source = generate_c_source(1000)
+    fixed = [line.replace("    ", "\t") if random.random() < 0.02 else line for line in source]
+    source_file = pathlib.Path.cwd().joinpath("source.c")
+
+    # Same blocks as found by exhaustive difflib search
+    expected = uncrustify._get_issues_from_diff(source_file, source, fixed)  # pylint: disable = protected-access
+    with mock.patch("universum.lib.diff.get_matching_blocks",
+                    lambda a, b: difflib.SequenceMatcher(a=a, b=b, autojunk=False).get_matching_blocks()):
+        assert uncrustify._get_issues_from_diff(source_file, source, fixed) == expected  # pylint: disable = protected-access
+
+    # Fully reformatted file of many thousand lines with lots of repeated lines
+    source = generate_c_source(5000)
+    fixed = [line.replace("    ", "  ") for line in source]
+    started = time.monotonic()
+    issues = uncrustify._get_issues_from_diff(source_file, source, fixed)  # pylint: disable = protected-access
+    elapsed = time.monotonic() - started
+    print(f"Compared {len(source)} lines in {elapsed:.2f} s")
+    assert len(issues) == 5000
+    assert elapsed < 10
+
+
+def test_uncrustify_parallel_output_parser(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    files = []
+    for number in range(8):
+        source = tmpdir.join(f"source_{number}.c")
+        source.write("".join(generate_c_source(10)))
+        fixed = tmpdir.mkdir(f"fixed_{number}").join(f"source_{number}.c")
+        fixed.write("".join(generate_c_source(10)).replace("    ", "\t", number))
+        files.append((pathlib.Path(str(source)), pathlib.Path(str(fixed))))
+
+    results = []
+    for jobs in [1, 3]:
+        html_dir = tmpdir.mkdir(f"html_{jobs}")
+        writer = uncrustify.HtmlDiffFileWriter(pathlib.Path(str(html_dir)), 80, 4)
+        results.append(uncrustify.uncrustify_output_parser(files, writer, jobs))
+        assert len(html_dir.listdir()) == 7  # the first file has no changes
+
+    assert sorted({issue["path"] for issue in results[0]}) == [f"source_{number}.c" for number in range(1, 8)]
+    assert results[0] == results[1]
+
+
+def test_scan_build_parallel_parsing(tmpdir):
+    report_files = []
+    for number in range(6):
+        report = tmpdir.join(f"report-{number}.html")
+        # Reports 0-2 are the same bug reported for several translation units
+        report.write(scan_build_html_report.replace("line 1,", f"line {max(number, 2) - 1},"))
+        report_files.append(str(report))
+    tmpdir.join("index.html").write("<html><body><h1>Summary</h1><table></table></body></html>")
+    tmpdir.join("empty.html").write("")
+    report_files += [str(tmpdir.join("index.html")), str(tmpdir.join("empty.html"))]
+
+    results = [scan_build_report.scan_build_report_output_parser(report_files, jobs) for jobs in [1, 3]]
+    assert [issue["line"] for issue in results[0]] == [1, 2, 3, 4]
+    assert results[0] == results[1]
+
+
+def test_sarif_streaming_and_deduplication(tmpdir):
+    def result(line, text, rule="error", **fingerprints):
+        location = {"physicalLocation": {"artifactLocation": {"uri": "my%20path/file.c"}, "region": {"startLine": line}}}
+        return {"ruleId": rule, "message": {"text": text}, "locations": [location], **fingerprints}
+
+    tool = {"driver": {"name": "Dummy", "version": "1.0"}}
+    other_tool = {"driver": {"name": "Other", "version": "1.0"}}
+    first = {"version": "2.1.0", "runs": [
+        {"tool": tool, "results": [result(1, "Error!"), result(2, "Error!", partialFingerprints={"hash": "a"})]},
+        # Properties of a run may come in any order, and runs may repeat each other
+        {"results": [result(1, "Error!"), result(3, "Other error!")], "invocations": [{}], "tool": tool},
+    ]}
+    second = {"runs": [{"tool": tool, "results": [
+        # Message differs, but partial fingerprint identifies the result as the already reported one
+        result(2, "Error in other words!", partialFingerprints={"hash": "a"}),
+        result(2, "Error!", partialFingerprints={"hash": "b"}),
+        # Same fingerprint, but other rule
+        result(2, "Error!", rule="warning", partialFingerprints={"hash": "b"}),
+    ]}, {"tool": other_tool, "results": [
+        # Same fingerprint, but other tool
+        result(2, "Error!", partialFingerprints={"hash": "b"}),
+    ]}], "version": "2.1.0"}
+    report_files = []
+    for number, report in enumerate([first, second, first]):
+        report_file = tmpdir.join(f"report-{number}.sarif")
+        report_file.write(json.dumps(report, indent=2))
+        report_files.append(str(report_file))
+
+    results = [sarif_report_output_parser(report_files, jobs) for jobs in [1, 3]]
+    assert [(issue["path"], issue["line"]) for issue in results[0]] == [("my path/file.c", line) for line in [1, 2, 3, 2, 2, 2]]
+    assert results[0][0]["message"] == "Dummy [1.0] : {'text': 'Error!'}"
+    assert results[0][-1]["message"] == "Other [1.0] : {'text': 'Error!'}"
+    assert results[0] == results[1]
+    # Repeated run is dropped before the results of the file are passed back from the worker
+    assert len(parse_sarif_file(report_files[0])) == 3
+
+    tmpdir.join("unsupported.sarif").write(json.dumps({"runs": [], "version": "1.0.0"}))
+    with pytest.raises(ValueError, match="Version 1.0.0 is not supported"):
+        sarif_report_output_parser([str(tmpdir.join("unsupported.sarif"))])
+    tmpdir.join("malformed.sarif").write(json.dumps({"version": "2.1.0", "runs": [{"results": []}]}))
+    with pytest.raises(ValueError, match="Malformed SARIF file"):
+        sarif_report_output_parser([str(tmpdir.join("malformed.sarif"))])
@@ -0,0 +1,154 @@
+import json
+import os
+import subprocess
+
+from universum import __main__
+from universum.analyzers.pylint import InProcessLinter
+from universum.modules import reporter
+from . import utils
+from .utils import python, python_version
+
+
+def test_merged_code_report(tmpdir):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    env.settings.LocalMainVcs.source_dir = str(tmpdir)
+
+    first = [{"path": "b.py", "line": 3, "symbol": "invalid-name", "message": "Name"},
+             {"path": "a.py", "line": 10, "symbol": "invalid-name", "message": "Name"},
+             {"path": "a.py", "line": 2, "symbol": "missing-docstring", "message": "Docstring"}]
+    # The first issue is reported by both analyzers, and is listed only once in merged report
+    second = first[:1] + [{"path": "b.py", "line": 1, "symbol": "error", "message": "Error"}]
+    tmpdir.join("first.json").write(json.dumps(first))
+    tmpdir.join("second.json").write(json.dumps(second))
+    env.configs_file.write("""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([
+    Step(name="First", code_report=True, command=["bash", "-c", "cp first.json ${CODE_REPORT_FILE}"]),
+    Step(name="Second", code_report=True, command=["bash", "-c", "cp second.json ${CODE_REPORT_FILE}"]),
+])
+""")
+
+    assert __main__.run(env.settings) == 0
+    artifact_dir = tmpdir.join("artifacts")
+    merged = json.loads(artifact_dir.join("Static_analysis_report.json").read())
+    assert merged["total"] == 4
+    assert merged["analyzers"] == {"First": 3, "Second": 1}
+    assert merged["symbols"] == {"error": 1, "invalid-name": 2, "missing-docstring": 1}
+    assert [(issue["line"], issue["analyzer"]) for issue in merged["files"]["a.py"]] == [(2, "First"), (10, "First")]
+    assert [(issue["line"], issue["analyzer"]) for issue in merged["files"]["b.py"]] == [(1, "Second"), (3, "First")]
+
+    index = json.loads(artifact_dir.join("Static_analysis_report_index.json").read())
+    assert index["files"]["b.py"]["count"] == 2
+    with open(str(artifact_dir.join("Static_analysis_report.jsonl")), "rb") as lines:
+        assert len(lines.readlines()) == 4
+        lines.seek(index["files"]["b.py"]["offset"])
+        assert json.loads(lines.readline()) == dict(second[1], analyzer="Second")
+
+
+def test_code_report_baseline(tmpdir, stdout_checker):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    env.settings.LocalMainVcs.source_dir = str(tmpdir)
+
+    source_lines = [f"variable_{number} = {number}\n" for number in range(10)]
+    tmpdir.join("source.py").write("".join(source_lines))
+    known = [{"path": "source.py", "line": 3, "symbol": "invalid-name", "message": "Name at line 3"},
+             {"path": "source.py", "line": 7, "symbol": "invalid-name", "message": "Name at line 7"}]
+    tmpdir.join("known.json").write(json.dumps(known))
+    baseline_file = tmpdir.join("baseline.json")
+    assert __main__.main(["code-report-baseline", str(tmpdir.join("known.json")),
+                          "--baseline-file", str(baseline_file), "--source-dir", str(tmpdir)]) == 0
+    assert sum(json.loads(baseline_file.read())["fingerprints"].values()) == 2
+
+    # Known issues are shifted by inserted lines, and a new issue is found in the inserted code
+    tmpdir.join("source.py").write("".join(["import os\n", "variable = os.name\n"] + source_lines))
+    found = [dict(issue, line=issue["line"] + 2, message=f"Name at line {issue['line'] + 2}") for issue in known]
+    found.append({"path": "source.py", "line": 2, "symbol": "invalid-name", "message": "Name at line 2"})
+    tmpdir.join("found.json").write(json.dumps(found))
+    env.configs_file.write("""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Report", code_report=True, command=["cp", "found.json", "${CODE_REPORT_FILE}"])])
+""")
+    env.settings.CodeReportCollector.code_report_baseline = str(baseline_file)
+
+    assert __main__.run(env.settings) == 0
+    stdout_checker.assert_has_calls_with_param("2 of 3 issues are skipped as known by baseline")
+    stdout_checker.assert_has_calls_with_param("Found 1 issues")
+
+
+def test_pylint_in_process(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    source = '"Docstring."\n\nname: str = "world"\nprint(f"Hello {name}.")\n'
+    tmpdir.join("first.py").write(source + '\n')
+    # Message of 'comparison-with-itself' contains symbols escaped in pylint JSON output
+    tmpdir.join("second.py").write(source + 'VALUE = 1\nprint(VALUE < VALUE)\n')
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+
+    def run_pylint(*extra_args):
+        result_file = tmpdir.join("result.json")
+        subprocess.run([python(), "-m", "universum.analyzers.pylint", "--python-version", python_version(),
+                        "--result-file", str(result_file), *extra_args],
+                       cwd=str(tmpdir), env=environment, capture_output=True, check=False)
+        return json.loads(result_file.read())
+
+    # The same linter checks several lists of files, reporting the same issues as separate pylint runs
+    linter = InProcessLinter(None)
+    for files in [["first.py"], ["second.py"], ["first.py", "second.py"]]:
+        assert linter.check(files) == run_pylint("--files", *files)
+    assert any("<" in issue["message"] for issue in linter.check(["second.py"]))
+    assert run_pylint("--files", "first.py", "second.py", "--in-process") == \
+        run_pylint("--files", "first.py", "second.py")
+
+
+def test_concurrent_code_report_not_supported(tmpdir, stdout_checker):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    env.settings.LocalMainVcs.source_dir = str(tmpdir)
+    env.settings.Main.concurrent_code_report = True
+    tmpdir.join("found.json").write(json.dumps([{"path": "a.py", "line": 1, "symbol": "error", "message": "Error"}]))
+    env.configs_file.write("""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Report", code_report=True, command=["cp", "found.json", "${CODE_REPORT_FILE}"])])
+""")
+
+    # Code report steps are executed as without '--concurrent-code-report'
+    assert __main__.run(env.settings) == 0
+    stdout_checker.assert_has_calls_with_param("Concurrent code report is disabled because current VCS doesn't support it")
+    stdout_checker.assert_absent_calls_with_param("Preparing original sources")
+    stdout_checker.assert_has_calls_with_param("Found 1 issues")
+
+
+def test_code_report_file_variable(tmpdir, monkeypatch, stdout_checker):
+    env = utils.TestEnvironment(tmpdir, "main")
+    env.settings.Vcs.type = "none"
+    env.settings.LocalMainVcs.source_dir = str(tmpdir)
+    env.settings.Main.no_diff = True
+    reported = tmpdir.join("reported.txt")
+    original_code_report = reporter.Reporter.code_report
+
+    def code_report(self, path, message):
+        reported.write(path + "\n", mode="a")
+        original_code_report(self, path, message)
+
+    monkeypatch.setattr(reporter.Reporter, "code_report", code_report)
+    tmpdir.join("found.json").write(json.dumps([{"path": "a.py", "line": 1, "symbol": "error", "message": "Error"}]))
+    # Result file is passed in the environment of the step, that is kept when the step is combined with its parent;
+    # the second step only succeeds if the results are processed while the build is still running
+    env.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Group ")]) * Configuration([
+    Step(name="Report", code_report=True, command=["bash", "-c", "cp found.json $UNIVERSUM_CODE_REPORT_FILE"]),
+    Step(name="Wait", command=["bash", "-c", "for i in $(seq 100); do [ -f {reported} ] && exit 0; sleep 0.1; done; "
+                                             "exit 1"]),
+])
+""")
+
+    assert __main__.run(env.settings) == 0
+    stdout_checker.assert_absent_calls_with_param("Failed")
+    stdout_checker.assert_has_calls_with_param("Found 1 issues")
+    assert reported.read() == "a.py\n"
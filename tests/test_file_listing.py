@@ -0,0 +1,41 @@
+import io
+
+from universum.lib import file_listing
+
+
+def create_tree(tmpdir):
+    tmpdir.join("readme.txt").write("text")
+    tmpdir.mkdir("src").mkdir("nested").join("code.py").write("pass\n")
+    tmpdir.join("src").join("main.py").write("print()\n")
+    return str(tmpdir)
+
+
+def test_file_list(tmpdir):
+    root = create_tree(tmpdir)
+    output = io.StringIO()
+    assert file_listing.write_file_list(root, output) == 5
+    headers = [line for line in output.getvalue().splitlines() if line.endswith(":")]
+    assert headers == [root + ":", root + "/src:", root + "/src/nested:"]
+    assert "code.py" in output.getvalue()
+
+    output = io.StringIO()
+    assert file_listing.write_file_list(root, output, max_depth=1) == 4
+    assert "code.py" not in output.getvalue()
+    assert "maximum depth reached" in output.getvalue()
+
+    output = io.StringIO()
+    assert file_listing.write_file_list(root, output, max_entries=3) == 3
+    assert "Listing is truncated after 3 entries" in output.getvalue()
+
+
+def test_file_digest(tmpdir):
+    root = create_tree(tmpdir)
+    output = io.StringIO()
+    file_listing.write_file_digest(root, output)
+    first_digest = output.getvalue()
+    assert "3 files, 2 directories, 17 bytes in total" in first_digest
+
+    tmpdir.join("src").join("main.py").write("print(1)\n")
+    output = io.StringIO()
+    file_listing.write_file_digest(root, output)
+    assert output.getvalue().splitlines()[-1] != first_digest.splitlines()[-1]
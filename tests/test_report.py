@@ -1,5 +1,8 @@
 # pylint: disable = redefined-outer-name, abstract-method
 
+import sys
+
+import git
 import pytest
 
 from universum import __main__
@@ -41,3 +44,21 @@ def test_github_run(http_check, report_environment, monkeypatch):
     http_check.assert_request_body_contained("status", "in_progress")
     http_check.assert_request_body_contained("status", "completed")
     http_check.assert_request_body_contained("conclusion", "success")
+
+
+def test_github_code_report_without_default_branch(http_check, report_environment, monkeypatch, stdout_checker):
+    monkeypatch.setattr(GithubToken, 'get_token', lambda *args, **kwargs: "this is token")
+    # Clone gets no 'origin/HEAD', as the server HEAD refers to a missing branch
+    git.Repo(str(report_environment.temp_dir.join("server"))).git.symbolic_ref("HEAD", "refs/heads/missing")
+    report_environment.configs_file.write(f"""
+from universum.configuration_support import Configuration, Step
+
+configs = Configuration([Step(name="Report", code_report=True,
+                              command=[{sys.executable!r}, "-c", "import sys; open(sys.argv[1], 'w').write('[]')",
+                                       "${{CODE_REPORT_FILE}}"])])
+""")
+
+    http_check.assert_success_and_collect(__main__.run, report_environment.settings,
+                                          url=report_environment.path, method="PATCH")
+    http_check.assert_request_body_contained("conclusion", "success")
+    stdout_checker.assert_has_calls_with_param("only the checked commit is compared")
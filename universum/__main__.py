@@ -4,6 +4,7 @@ import sys
 
 from . import __version__, __title__
 from .api import Api
+from .code_report_baseline import CodeReportBaseline
 from .github_handler import GithubHandler
 from .config_creator import ConfigCreator
 from .lib.ci_exception import SilentAbortException
@@ -24,7 +25,7 @@ def define_arguments() -> ModuleArgumentParser:
     define_arguments_recursive(Main, parser)
 
     subparsers = parser.add_subparsers(title="Additional commands",
-                                       metavar="{init,run,poll,submit,github-handler}",
+                                       metavar="{init,run,poll,submit,github-handler,code-report-baseline}",
                                        help="Use 'universum <subcommand> --help' for more info")
 
     def define_command(klass, command):
@@ -40,6 +41,7 @@ def define_arguments() -> ModuleArgumentParser:
     define_command(Nonci, "run")
     define_command(Nonci, "nonci")
     define_command(GithubHandler, "github-handler")
+    define_command(CodeReportBaseline, "code-report-baseline")
 
     return parser
 
@@ -0,0 +1,91 @@
+import argparse
+import importlib
+import inspect
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from . import utils
+
+
+def batch_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run several analyzers in one process")
+    parser.add_argument("--analyzer", "-a", dest="analyzers", action="append", required=True, metavar="COMMAND_LINE",
+                        help="Analyzer module name (such as 'pylint', or full module name for analyzers outside "
+                             "Universum) followed by its arguments, including its own '--result-file'; "
+                             "accepts multiple values. Common arguments of the batch are added to each analyzer, "
+                             "unless overridden by its own ones")
+    utils.add_files_argument(parser)
+    utils.add_jobs_argument(parser)
+    return parser
+
+
+def get_common_arguments(settings: argparse.Namespace) -> List[str]:
+    """
+    >>> settings = argparse.Namespace(file_list=["*.py"], gitignore=True, only_changed="", jobs=2)
+    >>> get_common_arguments(settings)
+    ['--files', '*.py', '--gitignore', '--only-changed', '--jobs', '2']
+    """
+    result: List[str] = ["--files"] + settings.file_list
+    if settings.gitignore:
+        result.append("--gitignore")
+    if settings.only_changed is not None:
+        result.extend(["--only-changed", settings.only_changed] if settings.only_changed else ["--only-changed"])
+    result.extend(["--jobs", str(settings.jobs)])
+    return result
+
+
+def load_analyzer(name: str) -> utils.Analyzer:
+    module_name: str = name if "." in name else "universum.analyzers." + name
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise utils.AnalyzerException(message=f"Failed to import analyzer '{name}': {e}") from e
+    main_function = getattr(module, "main", None)
+    analyzer = inspect.unwrap(main_function) if callable(main_function) else None
+    if not isinstance(analyzer, utils.Analyzer):
+        raise utils.AnalyzerException(message=f"Module '{module_name}' is not an analyzer")
+    return analyzer
+
+
+def run_analyzer(name: str, analyzer: utils.Analyzer,
+                 settings: argparse.Namespace) -> Tuple[List[utils.ReportData], Optional[str]]:
+    try:
+        return analyzer.analyze(settings), None
+    except Exception as e:  # pylint: disable=broad-except
+        message: Optional[str] = getattr(e, "message", None)
+        return [], f"Analyzer '{name}' failed: {message or e}\n"
+
+
+@utils.sys_exit
+def main() -> List[utils.ReportData]:
+    settings: argparse.Namespace = batch_argument_parser().parse_args()
+    common: List[str] = get_common_arguments(settings)
+
+    # Settings of all analyzers are parsed before running any of them, so that argument errors are found at once;
+    # the files are discovered once and shared by all analyzers
+    discovery = utils.FileDiscovery()
+    runs: List[Tuple[str, utils.Analyzer, argparse.Namespace]] = []
+    for command_line in settings.analyzers:
+        name, *args = shlex.split(command_line)
+        analyzer = load_analyzer(name)
+        analyzer.parser.prog = f"--analyzer '{name}'"
+        runs.append((name, analyzer, analyzer.parse_settings(common + args, discovery)))
+
+    # Analyzers mostly wait for their own subprocesses, so they are run in threads
+    with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+        results = list(executor.map(lambda run: run_analyzer(*run), runs))
+
+    issues: List[utils.ReportData] = []
+    errors: List[str] = []
+    for run_issues, error in results:
+        issues.extend(run_issues)
+        if error:
+            errors.append(error)
+    if errors:
+        raise utils.AnalyzerException(message="".join(errors))
+    return issues
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import functools
+import json
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import utils
+
+SOURCE_EXTENSIONS = (".c", ".cc", ".cpp", ".cxx", ".c++", ".m", ".mm")
+DIAGNOSTIC = re.compile(r"^(?P<path>.+?):(?P<line>\d+):(?P<column>\d+): (?P<severity>warning|error): "
+                        r"(?P<message>.*?)(?: \[(?P<check>[^\]\s]+)\])?$")
+INCLUDE = re.compile(rb"^\s*#\s*(?:include|import)\s*([<\"])([^>\"]+)[>\"]", re.MULTILINE)
+INCLUDE_DIR_OPTIONS = ("-I", "-iquote", "-isystem", "-idirafter")
+
+CompileCommand = Dict[str, str]
+
+
+def clang_tidy_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Clang-tidy analyzer")
+    parser.add_argument("--build-dir", "-p", dest="build_dir", default=".",
+                        help="Directory containing 'compile_commands.json' with compilation commands "
+                             "of the translation units; default is current directory")
+    parser.add_argument("--config-file", dest="config_file",
+                        help="Clang-tidy configuration file; by default '.clang-tidy' files "
+                             "in the parent directories of each source file are used")
+    parser.add_argument("--checks", dest="checks",
+                        help="Clang-tidy checks filter, such as '-*,bugprone-*', added to the configured ones")
+    parser.add_argument("--clang-tidy", dest="clang_tidy", default="clang-tidy",
+                        help="Clang-tidy executable, such as 'clang-tidy-14'; default is 'clang-tidy'")
+    utils.add_cache_arguments(parser)
+    return parser
+
+
+@utils.sys_exit
+@utils.analyzer(clang_tidy_argument_parser(), extensions=SOURCE_EXTENSIONS)
+def main(settings: argparse.Namespace) -> List[utils.ReportData]:
+    commands = select_translation_units(read_compile_commands(settings.build_dir), settings.file_list)
+    cmd = [settings.clang_tidy, "-p", settings.build_dir, "--quiet"]
+    if settings.config_file:
+        cmd.append(f"--config-file={settings.config_file}")
+    if settings.checks:
+        cmd.append(f"--checks={settings.checks}")
+
+    cache: Optional[utils.ResultCache] = None
+    if settings.cache_dir:
+        version, _ = utils.run_for_output([settings.clang_tidy, "--version"])
+        key = [version] + cmd[1:] + ([utils.hash_file(settings.config_file)] if settings.config_file else [])
+        cache = utils.ResultCache(settings.cache_dir, "\n".join(key), settings.cache_size * 1024 * 1024)
+
+    def check(command: CompileCommand) -> List[utils.ReportData]:
+        source = command["file"]
+        if cache is not None:
+            # Results of a translation unit are cached along with everything they depend on
+            unit_cache = utils.ResultCache(cache.cache_dir, cache.analyzer_key + "\n" + get_unit_key(command))
+            issues = unit_cache.load(source)
+            if issues is None:
+                issues = run_clang_tidy(cmd + [source])
+                unit_cache.store(source, issues)
+            return issues
+        return run_clang_tidy(cmd + [source])
+
+    # Clang-tidy processes do all the work, so threads are enough to keep them running in parallel
+    with ThreadPoolExecutor(max_workers=settings.jobs) as executor:
+        reports = list(executor.map(check, commands))
+    if cache is not None:
+        cache.evict()
+    # Issues in headers are reported for each translation unit including them
+    return utils.merge_reports(reports)
+
+
+def read_compile_commands(build_dir: str) -> List[CompileCommand]:
+    path = os.path.join(build_dir, "compile_commands.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            commands: List[CompileCommand] = json.load(f)
+    except OSError as e:
+        raise utils.AnalyzerException(message=f"Failed to read compilation database '{path}': {e}") from e
+    for command in commands:
+        command["file"] = os.path.normpath(os.path.join(command["directory"], command["file"]))
+    return commands
+
+
+def select_translation_units(commands: List[CompileCommand], file_list: List[str]) -> List[CompileCommand]:
+    """
+    Compilation commands of the source files that are listed or are located in the listed directories;
+    for files compiled several times, only the first command is used, same as clang-tidy does
+
+    >>> commands = [{"file": "/src/a.c"}, {"file": "/src/lib/b.c"}, {"file": "/other/c.c"}, {"file": "/src/a.c"}]
+    >>> [command["file"] for command in select_translation_units(commands, ["/src/lib/b.c", "/src/a.c"])]
+    ['/src/a.c', '/src/lib/b.c']
+    """
+    files: Set[str] = set()
+    directories: List[str] = []
+    for path in file_list:
+        absolute = os.path.abspath(path)
+        if os.path.isdir(absolute):
+            directories.append(os.path.join(absolute, ""))
+        else:
+            files.add(absolute)
+    result: Dict[str, CompileCommand] = {}
+    for command in commands:
+        source = command["file"]
+        if source not in result and (source in files or source.startswith(tuple(directories))):
+            result[source] = command
+    return list(result.values())
+
+
+def run_clang_tidy(cmd: List[str]) -> List[utils.ReportData]:
+    # Diagnostics are parsed while clang-tidy is running, without collecting its whole output,
+    # and stderr is redirected to a file not to block the process when the pipe is full
+    with tempfile.TemporaryFile("w+") as errors:
+        with subprocess.Popen(cmd, universal_newlines=True, stdout=subprocess.PIPE, stderr=errors) as process:
+            issues = clang_tidy_output_parser(process.stdout or [])
+        # Compilation errors are reported as issues; non-zero exit code without any of them means clang-tidy failure
+        if process.returncode and not issues:
+            errors.seek(0)
+            raise utils.AnalyzerException(code=process.returncode, message=errors.read())
+    return issues
+
+
+def clang_tidy_output_parser(output: Iterable[str]) -> List[utils.ReportData]:
+    """
+    >>> output = '''/src/a.c:3:5: warning: variable 'x' is not initialized [cppcoreguidelines-init-variables]
+    ...     int x;
+    ...         ^
+    ... /src/a.h:1:1: note: previous declaration is here
+    ... /src/a.c:7:1: error: unknown type name 'foo' [clang-diagnostic-error]'''
+    >>> [(issue["path"], issue["line"], issue["symbol"]) for issue in clang_tidy_output_parser(output.splitlines())]
+    [('/src/a.c', 3, 'cppcoreguidelines-init-variables'), ('/src/a.c', 7, 'clang-diagnostic-error')]
+    """
+    result: List[utils.ReportData] = []
+    cwd = os.path.join(os.getcwd(), "")
+    for line in output:
+        match = DIAGNOSTIC.match(line.rstrip("\n"))
+        if not match:
+            continue
+        path = match.group("path")
+        if path.startswith(cwd):
+            path = os.path.relpath(path, cwd)
+        result.append(utils.ReportData(
+            symbol=match.group("check") or "clang-tidy " + match.group("severity"),
+            message=match.group("message"),
+            path=path,
+            line=int(match.group("line"))
+        ))
+    return result
+
+
+def get_include_dirs(command: CompileCommand) -> Tuple[str, ...]:
+    arguments: List[str] = list(command.get("arguments") or shlex.split(command.get("command", "")))
+    result: List[str] = []
+    for index, argument in enumerate(arguments):
+        for option in INCLUDE_DIR_OPTIONS:
+            if argument == option and index + 1 < len(arguments):
+                result.append(arguments[index + 1])
+            elif argument.startswith(option) and len(argument) > len(option) and argument[len(option)] != "-":
+                result.append(argument[len(option):])
+    return tuple(os.path.normpath(os.path.join(command["directory"], path)) for path in result)
+
+
+@functools.lru_cache(maxsize=None)
+def get_includes(path: str, include_dirs: Tuple[str, ...]) -> Tuple[str, ...]:
+    try:
+        with open(path, "rb") as f:
+            text = f.read()
+    except OSError:
+        return ()
+    result: List[str] = []
+    for kind, name in INCLUDE.findall(text):
+        name = name.decode("utf-8", "surrogateescape")
+        search_dirs = ((os.path.dirname(path),) if kind == b'"' else ()) + include_dirs
+        for directory in search_dirs:
+            candidate = os.path.normpath(os.path.join(directory, name))
+            if os.path.isfile(candidate):
+                result.append(candidate)
+                break
+    return tuple(result)
+
+
+@functools.lru_cache(maxsize=None)
+def hash_dependency(path: str) -> str:
+    return utils.hash_file(path)
+
+
+def get_unit_key(command: CompileCommand) -> str:
+    """
+    Identity of everything the results of the translation unit depend on: compilation command,
+    contents of the headers it includes (as far as they can be found without preprocessing the source;
+    system headers not found in include directories are not taken into account) and '.clang-tidy' files
+    """
+    include_dirs = get_include_dirs(command)
+    dependencies: Set[str] = set()
+    pending: List[str] = [command["file"]]
+    while pending:
+        for include in get_includes(pending.pop(), include_dirs):
+            if include not in dependencies:
+                dependencies.add(include)
+                pending.append(include)
+    directory = os.path.dirname(command["file"])
+    while True:
+        if os.path.isfile(os.path.join(directory, ".clang-tidy")):
+            dependencies.add(os.path.join(directory, ".clang-tidy"))
+        if os.path.dirname(directory) == directory:
+            break
+        directory = os.path.dirname(directory)
+
+    key = [json.dumps([command["directory"], command.get("arguments"), command.get("command")])]
+    key.extend(f"{path}\0{hash_dependency(path)}" for path in sorted(dependencies))
+    return "\n".join(key)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter  # see https://github.com/PyCQA/pylint/issues/259
@@ -0,0 +1,138 @@
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Match, Set, Tuple
+
+from . import utils
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# All the formats are combined into a single expression, so that each chunk of the log is scanned once;
+# the lines are matched as bytes, and only the matching ones are decoded
+DIAGNOSTIC = re.compile(
+    # Lines may be prefixed with the name of the stream by the tool running the build, e.g. 'stderr: '
+    # GCC and Clang: 'path:line[:column]: warning: message [-Wflag]'
+    rb"^[ \t]*(?:[A-Za-z]+: )?(?P<gcc_path>(?:[A-Za-z]:)?[^:\r\n]+):(?P<gcc_line>\d+):(?:\d+:)? "
+    rb"(?P<gcc_severity>warning|error|fatal error): (?P<gcc_message>[^\r\n]*?)"
+    rb"(?: \[(?P<gcc_flag>-W[^\]\r\n]+)\])?\r?$"
+    rb"|"
+    # MSVC: 'path(line[,column]): warning C4996: message', possibly followed by MSBuild project name;
+    # path may contain parentheses itself, e.g. 'C:\Program Files (x86)\...'
+    rb"^[ \t]*(?:[A-Za-z]+: )?(?:\d+>)?(?P<msvc_path>[^\r\n]+?)\((?P<msvc_line>\d+)(?:,\d+)?\) ?: "
+    rb"(?P<msvc_severity>warning|error|fatal error) (?P<msvc_code>[A-Z]+\d+): (?P<msvc_message>[^\r\n]*?)"
+    rb"(?: \[[^\]\r\n]+\])?\r?$",
+    re.MULTILINE)
+
+IssueKey = Tuple[str, int, str, str]
+
+
+def compiler_warnings_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Collect compiler warnings and errors from build logs")
+    return parser
+
+
+@utils.sys_exit
+@utils.analyzer(compiler_warnings_argument_parser(), extensions=(".log", ".txt"))
+def main(settings: argparse.Namespace) -> List[utils.ReportData]:
+    if settings.jobs > 1 and len(settings.file_list) > 1:
+        with ProcessPoolExecutor(max_workers=settings.jobs) as executor:
+            reports = list(executor.map(parse_log_file, settings.file_list))
+    else:
+        reports = [parse_log_file(log_file) for log_file in settings.file_list]
+    return utils.merge_reports(reports)
+
+
+def parse_log_file(log_file: str) -> List[utils.ReportData]:
+    with open(log_file, "rb") as f:
+        return compiler_warnings_output_parser(f)
+
+
+def read_chunks(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read the stream in chunks ending with a complete line, so that no line is split between chunks;
+    lines longer than the chunk are dropped, as they cannot be compiler messages anyway
+
+    >>> import io
+    >>> list(read_chunks(io.BytesIO(b"first\\nsecond\\nthird"), 8))
+    [b'first\\n', b'second\\n', b'third']
+    >>> list(read_chunks(io.BytesIO(b"too long line\\nshort\\n"), 8))
+    [b'short\\n']
+    """
+    remainder: bytes = b""
+    skipping: bool = False
+    for data in iter(lambda: stream.read(chunk_size), b""):
+        start = 0
+        if skipping:
+            # Rest of the line that did not fit into the chunk
+            start = data.find(b"\n") + 1
+            if not start:
+                continue
+            skipping = False
+        end = data.rfind(b"\n") + 1
+        if end > start:
+            yield remainder + data[start:end]
+            remainder = data[end:]
+        else:
+            remainder += data[start:]
+        if len(remainder) >= chunk_size:
+            remainder, skipping = b"", True
+    if remainder:
+        yield remainder
+
+
+def compiler_warnings_output_parser(stream: BinaryIO) -> List[utils.ReportData]:
+    """
+    Issues found in the log; issues repeated for several translation units (e.g. in headers) are reported once
+
+    >>> import io
+    >>> log = io.BytesIO(b'''[ 10%] Building C object first.c.o
+    ... /src/common.h:3:5: warning: unused variable 'x' [-Wunused-variable]
+    ...     3 |     int x;
+    ... /src/common.h:3:5: warning: unused variable 'x' [-Wunused-variable]
+    ... 1>C:\\\\src\\\\main.cpp(12,7): warning C4996: 'strcpy': This function may be unsafe. [C:\\\\src\\\\main.vcxproj]
+    ... main.c:7: error: expected ';' before '}' token
+    ... ''')
+    >>> for issue in compiler_warnings_output_parser(log):
+    ...     print(issue["path"], issue["line"], issue["symbol"], issue["message"], sep=" | ")
+    /src/common.h | 3 | -Wunused-variable | unused variable 'x'
+    C:\\src\\main.cpp | 12 | C4996 | 'strcpy': This function may be unsafe.
+    main.c | 7 | compiler error | expected ';' before '}' token
+    """
+    result: List[utils.ReportData] = []
+    known: Set[IssueKey] = set()
+    cwd = os.path.join(os.getcwd(), "")
+    for chunk in read_chunks(stream):
+        for match in DIAGNOSTIC.finditer(chunk):
+            issue = to_report_data(match, cwd)
+            key = (issue["path"], issue["line"], issue["symbol"], issue["message"])
+            if key not in known:
+                known.add(key)
+                result.append(issue)
+    return result
+
+
+def to_report_data(match: Match[bytes], cwd: str) -> utils.ReportData:
+    def group(name: str) -> str:
+        return match.group(name).decode("utf-8", "replace")
+
+    prefix = "gcc" if match.group("gcc_path") else "msvc"
+    path = group(prefix + "_path").strip()
+    if path.startswith(cwd):
+        path = os.path.relpath(path, cwd)
+    if prefix == "gcc" and match.group("gcc_flag"):
+        symbol = group("gcc_flag")
+    elif prefix == "msvc":
+        symbol = group("msvc_code")
+    else:
+        symbol = "compiler " + group("gcc_severity").split()[-1]
+    return utils.ReportData(
+        symbol=symbol,
+        message=group(prefix + "_message"),
+        path=path,
+        line=int(match.group(prefix + "_line"))
+    )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter  # see https://github.com/PyCQA/pylint/issues/259
@@ -1,28 +1,63 @@
 import argparse
+import hashlib
+import os
+import re
 
 from typing import List
 
 from . import utils
 
+# Idle daemon exits after this number of seconds, not to hold the memory on agents where builds are rare
+DAEMON_TIMEOUT = 3 * 60 * 60
+# Lines about the daemon state, printed by 'dmypy run' along with the usual mypy output
+DAEMON_MESSAGE = re.compile(r"^(Daemon (started|stopped)|Restarting: .*)$")
+
 
 def mypy_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Mypy analyzer")
     parser.add_argument("--config-file", dest="config_file", type=str, help="Specify a configuration file.")
     utils.add_python_version_argument(parser)
+    parser.add_argument("--daemon", action="store_true", dest="daemon",
+                        help="Run mypy daemon (dmypy), that keeps the analysis results in memory between runs, "
+                             "so that only changed files and their dependents are checked again. The daemon is "
+                             "stopped after being idle for three hours. With '--jobs', a daemon is started "
+                             "for each part of the files")
+    parser.add_argument("--daemon-dir", dest="daemon_dir", default=os.path.join("~", ".cache", "universum", "dmypy"),
+                        help="Directory for status files of mypy daemons, shared by all runs on the agent; "
+                             "daemon for the same directory and options is reused, whatever files are checked. "
+                             "Default is '~/.cache/universum/dmypy'")
     return parser
 
 
 @utils.sys_exit
-@utils.analyzer(mypy_argument_parser())
+@utils.analyzer(mypy_argument_parser(), utils.shard_per_package, extensions=(".py", ".pyi"))
 def main(settings: argparse.Namespace) -> List[utils.ReportData]:
-    cmd = [f"python{settings.version}", '-m', 'mypy', '--ignore-missing-imports']
+    options = ['--ignore-missing-imports']
     if settings.config_file:
-        cmd.append(f'--config-file={settings.config_file}')
-    cmd.extend(settings.file_list)
-    output, _ = utils.run_for_output(cmd)
+        options.append(f'--config-file={settings.config_file}')
+    options.extend(settings.file_list)
+    if settings.daemon:
+        cmd = [f"python{settings.version}", '-m', 'mypy.dmypy', '--status-file', get_status_file(settings),
+               'run', '--timeout', str(DAEMON_TIMEOUT), '--'] + options
+        output, _ = utils.run_for_output(cmd)
+        output = "".join(line for line in output.splitlines(keepends=True) if not DAEMON_MESSAGE.match(line.strip()))
+    else:
+        output, _ = utils.run_for_output([f"python{settings.version}", '-m', 'mypy'] + options)
     return mypy_output_parser(output)
 
 
+def get_status_file(settings: argparse.Namespace) -> str:
+    # Daemon checks the files relative to the directory it was started in, and restarts on any change of options,
+    # so each combination of them gets its own daemon instead of restarting a shared one; the list of files
+    # is not a part of the key, as it changes between runs (e.g. when only changed files are checked),
+    # while the daemon state is still valid for the rest of the files. Parts of the files checked
+    # in parallel with '--jobs' get separate daemons, as a daemon handles a single run at a time
+    key = "\0".join([os.getcwd(), settings.version, settings.config_file or "", str(getattr(settings, "shard", 0))])
+    daemon_dir = os.path.expanduser(settings.daemon_dir)
+    os.makedirs(daemon_dir, exist_ok=True)
+    return os.path.join(daemon_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
 def mypy_output_parser(output: str) -> List[utils.ReportData]:
     result: List[utils.ReportData] = []
     for raw_line in output.split('\n')[:-2]:  # last line is summary
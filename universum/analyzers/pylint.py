@@ -1,7 +1,13 @@
 import argparse
+import ast
+import functools
+import importlib
+import io
 import json
+import os
+import threading
 
-from typing import List
+from typing import Any, Iterable, List, Optional, Set, Tuple
 
 from . import utils
 
@@ -10,12 +16,117 @@ def pylint_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Pylint analyzer")
     parser.add_argument("--rcfile", dest="rcfile", type=str, help="Specify a configuration file.")
     utils.add_python_version_argument(parser)
+    parser.add_argument("--in-process", action="store_true", dest="in_process",
+                        help="Run pylint installed for the interpreter running the analyzer in the same process, "
+                             "instead of launching 'python<version> -m pylint'. Parsed modules are reused when "
+                             "checking several parts of the files, e.g. with '--jobs' or '--cache-dir'. "
+                             "'--python-version' is ignored in this mode")
     return parser
 
 
+def pylint_cache_key(settings: argparse.Namespace) -> str:
+    if settings.in_process:
+        output = "pylint " + import_pylint().__version__
+    else:
+        output, _ = utils.run_for_output([f"python{settings.version}", '-m', 'pylint', '--version'])
+    key = [output]
+    # Without '--rcfile', pylint looks for configuration in current directory
+    config_files = [settings.rcfile] if settings.rcfile else ["pylintrc", ".pylintrc", "pyproject.toml", "setup.cfg"]
+    for config_file in config_files:
+        if os.path.isfile(config_file):
+            key.append(utils.hash_file(config_file))
+    return "\n".join(key)
+
+
+def get_import_roots(path: str) -> Tuple[str, ...]:
+    """
+    Directories absolute imports of the module are looked up in: the directory containing its top-level
+    package (or its own directory for modules outside packages), and current directory
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    while os.path.isfile(os.path.join(directory, "__init__.py")) and os.path.dirname(directory) != directory:
+        directory = os.path.dirname(directory)
+    return directory, os.getcwd()
+
+
+def find_module(name: str, roots: Iterable[str]) -> List[str]:
+    """
+    Files of the module and of its parent packages in the first of the roots containing the module
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as root:
+    ...     os.makedirs(os.path.join(root, "package"))
+    ...     for name in ("__init__.py", "module.py"):
+    ...         open(os.path.join(root, "package", name), "w").close()
+    ...     [os.path.relpath(path, root) for path in find_module("package.module", ["/nonexistent", root])]
+    ['package/__init__.py', 'package/module.py']
+    """
+    parts: List[str] = name.split(".")
+    for root in roots:
+        packages: List[str] = []
+        directory: str = root
+        for part in parts[:-1]:
+            directory = os.path.join(directory, part)
+            if os.path.isfile(os.path.join(directory, "__init__.py")):
+                packages.append(os.path.join(directory, "__init__.py"))
+        base = os.path.join(directory, parts[-1])
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(candidate):
+                return packages + [os.path.abspath(candidate)]
+    return []
+
+
+@functools.lru_cache(maxsize=None)
+def get_direct_imports(path: str) -> Tuple[str, ...]:
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return ()
+    roots: Tuple[str, ...] = get_import_roots(path)
+    result: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                result.update(find_module(alias.name, roots))
+        elif isinstance(node, ast.ImportFrom):
+            # Imported names may be either attributes or submodules of the module
+            module_roots: Iterable[str] = roots
+            if node.level:
+                directory = os.path.dirname(os.path.abspath(path))
+                for _ in range(node.level - 1):
+                    directory = os.path.dirname(directory)
+                module_roots = [directory]
+            names: List[str] = [node.module] if node.module else []
+            names.extend(f"{node.module}.{alias.name}" if node.module else alias.name for alias in node.names)
+            for name in names:
+                result.update(find_module(name, module_roots))
+    return tuple(sorted(result))
+
+
+def get_module_dependencies(path: str) -> Set[str]:
+    """
+    Local modules the file imports directly or through the other local modules: issues reported
+    for a module (e.g. 'no-name-in-module' or 'no-member') also depend on the contents of these modules
+    """
+    source: str = os.path.abspath(path)
+    result: Set[str] = set()
+    pending: List[str] = [source]
+    while pending:
+        for dependency in get_direct_imports(pending.pop()):
+            if dependency not in result:
+                result.add(dependency)
+                pending.append(dependency)
+    result.discard(source)
+    return result
+
+
 @utils.sys_exit
-@utils.analyzer(pylint_argument_parser())
+@utils.analyzer(pylint_argument_parser(), utils.shard_per_file, pylint_cache_key, extensions=(".py",),
+                cache_dependencies=get_module_dependencies)
 def main(settings: argparse.Namespace) -> List[utils.ReportData]:
+    if settings.in_process:
+        return get_linter(settings.rcfile).check(settings.file_list)
     cmd = [f"python{settings.version}", '-m', 'pylint', '-f', 'json']
     if settings.rcfile:
         cmd.append(f'--rcfile={settings.rcfile}')
@@ -38,5 +149,58 @@ def pylint_output_parser(output: str) -> List[utils.ReportData]:
     return result
 
 
+def import_pylint() -> Any:
+    try:
+        return importlib.import_module("pylint")
+    except ImportError as e:
+        raise utils.AnalyzerException(message="Running pylint with '--in-process' requires 'pylint' package "
+                                              "to be installed for the interpreter running the analyzer") from e
+
+
+class InProcessLinter:
+    """
+    Pylint linter created once and reused for checking several lists of files: modules parsed for one list
+    are taken from astroid cache for the next ones. Messages are collected by reporter straight into
+    `ReportData`; the linter is not thread-safe, so the lists are checked one at a time
+    """
+
+    def __init__(self, rcfile: Optional[str]) -> None:
+        import_pylint()
+        self.rcfile: Optional[str] = rcfile
+        self.linter: Any = None
+        self.lock: threading.Lock = threading.Lock()
+        self.issues: List[utils.ReportData] = []
+
+        reporters = importlib.import_module("pylint.reporters")
+        collected = self.issues
+
+        class ReportDataCollector(reporters.BaseReporter):  # type: ignore[name-defined]
+            name = "universum"
+
+            def handle_message(self, msg: Any) -> None:
+                collected.append(utils.ReportData(symbol=msg.symbol, message=msg.msg, path=msg.path, line=msg.line))
+
+            def _display(self, layout: Any) -> None:
+                pass
+
+        self.reporter = ReportDataCollector(output=io.StringIO())
+
+    def check(self, file_list: List[str]) -> List[utils.ReportData]:
+        with self.lock:
+            self.issues.clear()
+            if self.linter is None:
+                args = [f"--rcfile={self.rcfile}"] if self.rcfile else []
+                run = importlib.import_module("pylint.lint").Run(args + file_list, reporter=self.reporter, exit=False)
+                self.linter = run.linter
+            else:
+                self.linter.check(file_list)
+            return list(self.issues)
+
+
+@functools.lru_cache(maxsize=None)
+def get_linter(rcfile: Optional[str]) -> InProcessLinter:
+    return InProcessLinter(rcfile)
+
+
 if __name__ == "__main__":
     main()  # pylint: disable=no-value-for-parameter  # see https://github.com/PyCQA/pylint/issues/259
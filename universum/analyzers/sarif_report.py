@@ -1,10 +1,17 @@
 import argparse
-import json
+import hashlib
 import urllib.parse
-from typing import Any, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
 
+from universum.lib.json_stream import JsonReader
 from . import utils
 
+# Results are identified by the tool and the rule, and then by the fingerprints (preferred) or partial fingerprints,
+# if the producing tool provides any, or by the message otherwise
+IssueKey = Tuple[Hashable, ...]
+# Driver name and its description used in messages
+Tool = Tuple[str, str]
 
 def scan_build_report_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Parse SARIF report")
@@ -12,55 +19,135 @@ def scan_build_report_argument_parser() -> argparse.ArgumentParser:
 
 
 @utils.sys_exit
-@utils.analyzer(scan_build_report_argument_parser())
+@utils.analyzer(scan_build_report_argument_parser(), extensions=(".sarif", ".json"))
 def main(settings: argparse.Namespace) -> List[utils.ReportData]:
-    issues = sarif_report_output_parser(settings.file_list)
+    issues = sarif_report_output_parser(settings.file_list, settings.jobs)
     return issues
 
 
-def sarif_report_output_parser(file_list: List[str]) -> List[utils.ReportData]:
+def sarif_report_output_parser(file_list: List[str], jobs: int = 1) -> List[utils.ReportData]:
+    if jobs > 1 and len(file_list) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return merge_unique_issues(executor.map(parse_sarif_file, file_list))
+    return merge_unique_issues(parse_sarif_file(report_file) for report_file in file_list)
+
+
+def merge_unique_issues(reports: Iterable[List[Tuple[bytes, utils.ReportData]]]) -> List[utils.ReportData]:
+    # Same results are often reported by several runs or files, e.g. for headers included in many sources
+    known: Set[bytes] = set()
     result: List[utils.ReportData] = []
-    for report_file in file_list:
-        with open(report_file, "r") as f:
-            report = json.loads(f.read())
-            try:
-                result.extend(parse_sarif_json(report))
-            except AttributeError as e:
-                raise ValueError("Malformed SARIF file") from e
+    for report in reports:
+        for digest, issue in report:
+            if digest not in known:
+                known.add(digest)
+                result.append(issue)
     return result
 
 
-def parse_sarif_json(report: Dict[str, Any]) -> List[utils.ReportData]:
-    result: List[utils.ReportData] = []
-    version: str = report.get('version', '')
+def get_issue_digest(key: IssueKey) -> bytes:
+    return hashlib.sha1(repr(key).encode("utf-8")).digest()
+
+
+def parse_sarif_file(report_file: str) -> List[Tuple[bytes, utils.ReportData]]:
+    """
+    Only the results unique within the file are returned, each with the fixed-size digest of its key,
+    so the data passed back from a worker process does not include any duplicates or full keys
+    """
+    known: Set[bytes] = set()
+    result: List[Tuple[bytes, utils.ReportData]] = []
+
+    def add_unique(issues: Iterator[Tuple[IssueKey, utils.ReportData]]) -> None:
+        for key, issue in issues:
+            digest = get_issue_digest(key)
+            if digest not in known:
+                known.add(digest)
+                result.append((digest, issue))
+
+    tools: Dict[int, Tool] = {}
+    deferred: Set[int] = set()
+    with open(report_file, "r", encoding="utf-8") as f:
+        try:
+            add_unique(parse_sarif_stream(JsonReader(f), tools, deferred))
+            if deferred:
+                # Results preceding the tool description are read again, instead of keeping them in memory
+                f.seek(0)
+                add_unique(parse_sarif_stream(JsonReader(f), tools, deferred, rescan=True))
+        except AttributeError as e:
+            raise ValueError("Malformed SARIF file") from e
+    return result
+
+
+def parse_sarif_stream(reader: JsonReader, tools: Dict[int, Tool], deferred: Set[int],
+                       rescan: bool = False) -> Iterator[Tuple[IssueKey, utils.ReportData]]:
+    """
+    Walk the report without loading it as a whole: only single results are decoded,
+    so memory usage does not depend on the report size.
+
+    Tools of the runs are collected to `tools` by run index. The results of the runs, which tool is not
+    described yet, are skipped, and the indexes of such runs are added to `deferred`; with `rescan` set,
+    only these results are processed.
+    """
+    version: str = ''
+    for key in reader.iterate_object():
+        if key == 'version':
+            version = reader.decode_value()
+            if version != '2.1.0':
+                raise ValueError(f"Version {version} is not supported")
+        elif key == 'runs':
+            for index, _ in enumerate(reader.iterate_array()):
+                yield from parse_sarif_run(reader, index, tools, deferred, rescan)
+        else:
+            reader.skip_value()
     if version != '2.1.0':
         raise ValueError(f"Version {version} is not supported")
-    for run in report.get('runs', []):
-        analyzer_data: Dict[str, str] = run.get('tool').get('driver')  # non-optional per definition
-        who: str = f"{analyzer_data.get('name')} [{analyzer_data.get('version', '?')}]"
-        for issue in run.get('results', []):
-            what: str = issue.get('message')
-            for location in issue.get('locations', []):
-                location_data: Dict[str, Dict[str, str]] = location.get('physicalLocation')
-                if not location_data:
-                    continue
-                artifact_data = location_data.get('artifactLocation')
-                if not artifact_data:
-                    if location_data.get('address'):
-                        continue  # binary artifact can't be processed
-                    raise ValueError("Unexpected lack of artifactLocation tag")
-                path: str = urllib.parse.unquote(artifact_data.get('uri', ''))
-                region_data = location_data.get('region')
-                if not region_data:
-                    continue  # TODO: cover this case as comment to the file as a whole
-                line = int(region_data.get('startLine', ''))
-                result.append(utils.ReportData(
-                    symbol="Reported issue",
-                    message=f"{who} : {what}",
-                    path=path,
-                    line=line
-                ))
-    return result
+
+
+def parse_sarif_run(reader: JsonReader, index: int, tools: Dict[int, Tool], deferred: Set[int],
+                    rescan: bool) -> Iterator[Tuple[IssueKey, utils.ReportData]]:
+    # Tool description is expected before the results, but the order of properties is not guaranteed
+    for key in reader.iterate_object():
+        if key == 'tool':
+            analyzer_data: Dict[str, str] = reader.decode_value().get('driver')  # non-optional per definition
+            name: str = analyzer_data.get('name', '')
+            tools[index] = name, f"{name} [{analyzer_data.get('version', '?')}]"
+        elif key == 'results' and (index in deferred if rescan else index in tools):
+            for _ in reader.iterate_array():
+                yield from parse_sarif_result(tools[index], reader.decode_value())
+        else:
+            if key == 'results':
+                deferred.add(index)
+            reader.skip_value()
+    if index not in tools:
+        raise AttributeError("Run has no 'tool' property")
+
+
+def parse_sarif_result(tool: Tool, issue: Dict[str, Any]) -> Iterator[Tuple[IssueKey, utils.ReportData]]:
+    name, who = tool
+    what: Any = issue.get('message')
+    message: str = f"{who} : {what}"
+    fingerprints: Optional[Dict[str, str]] = issue.get('fingerprints') or issue.get('partialFingerprints')
+    identity: IssueKey = (name, issue.get('ruleId'),
+                          tuple(sorted(fingerprints.items())) if fingerprints else message)
+    for location in issue.get('locations', []):
+        location_data: Dict[str, Dict[str, str]] = location.get('physicalLocation')
+        if not location_data:
+            continue
+        artifact_data = location_data.get('artifactLocation')
+        if not artifact_data:
+            if location_data.get('address'):
+                continue  # binary artifact can't be processed
+            raise ValueError("Unexpected lack of artifactLocation tag")
+        path: str = urllib.parse.unquote(artifact_data.get('uri', ''))
+        region_data = location_data.get('region')
+        if not region_data:
+            continue  # TODO: cover this case as comment to the file as a whole
+        line = int(region_data.get('startLine', ''))
+        yield (identity, path, line), utils.ReportData(
+            symbol="Reported issue",
+            message=message,
+            path=path,
+            line=line
+        )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import argparse
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from lxml import etree
 
 from . import utils
@@ -11,36 +12,58 @@ def scan_build_report_argument_parser() -> argparse.ArgumentParser:
 
 
 @utils.sys_exit
-@utils.analyzer(scan_build_report_argument_parser())
+@utils.analyzer(scan_build_report_argument_parser(), extensions=(".html",))
 def main(settings: argparse.Namespace) -> List[utils.ReportData]:
-    issues = scan_build_report_output_parser(settings.file_list)
+    issues = scan_build_report_output_parser(settings.file_list, settings.jobs)
     return issues
 
 
-def scan_build_report_output_parser(file_list: List[str]) -> List[utils.ReportData]:
-    result: List[utils.ReportData] = []
-    for report_file in file_list:
-        with open(report_file) as f:
-            parser = etree.HTMLParser()
-            tree: etree.ElementTree = etree.parse(f, parser)
-            found = any(x.text for x in tree.iter() if x.text == 'Bug Summary')
-            if not found:
-                continue
-            table_data = [x.getchildren() for x in tree.iter(tag='table')][0]
-            row_path = list(table_data[0])
-            row_issue = list(table_data[1])
-            if row_path[0].text != 'File:' or row_issue[0].text != 'Warning:':
-                raise ValueError("Wrong format of file: " + f.name)
-
-            issue_data = list(row_issue)[1]
-            line_data = list(issue_data)[0].text  # 'line 1, column 1'
-            result.append(utils.ReportData(
-                symbol="Reported issue",
-                message=list(issue_data)[1].tail,
-                path=row_path[1].text,
-                line=int(line_data.split(',')[0][5:])
-            ))
-    return result
+def scan_build_report_output_parser(file_list: List[str], jobs: int = 1) -> List[utils.ReportData]:
+    if jobs > 1 and len(file_list) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            issues = list(executor.map(parse_report_file, file_list,
+                                       chunksize=max(1, len(file_list) // (jobs * 4))))
+    else:
+        issues = [parse_report_file(report_file) for report_file in file_list]
+
+    # The same bug in a header is reported once for every translation unit including it
+    unique: Dict[Tuple[str, int, str], utils.ReportData] = {}
+    for issue in issues:
+        if issue:
+            unique.setdefault((issue["path"], issue["line"], issue["message"]), issue)
+    return list(unique.values())
+
+
+def parse_report_file(report_file: str) -> Optional[utils.ReportData]:
+    summary_found: bool = False
+    table_data: Optional[etree.Element] = None
+    # Summary is at the very beginning of the report, so the rest of the file is not even read
+    try:
+        for _, element in etree.iterparse(report_file, events=("end",), html=True):
+            if element.text == 'Bug Summary':
+                summary_found = True
+            elif element.tag == 'table' and table_data is None:
+                table_data = element
+            if summary_found and table_data is not None:
+                break
+    except etree.XMLSyntaxError:  # HTML parser recovers from any errors, but fails on empty files
+        return None
+    if not summary_found or table_data is None:
+        return None
+
+    row_path = list(table_data[0])
+    row_issue = list(table_data[1])
+    if row_path[0].text != 'File:' or row_issue[0].text != 'Warning:':
+        raise ValueError("Wrong format of file: " + report_file)
+
+    issue_data = list(row_issue)[1]
+    line_data = list(issue_data)[0].text  # 'line 1, column 1'
+    return utils.ReportData(
+        symbol="Reported issue",
+        message=list(issue_data)[1].tail,
+        path=row_path[1].text,
+        line=int(line_data.split(',')[0][5:])
+    )
 
 
 if __name__ == "__main__":
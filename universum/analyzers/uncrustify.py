@@ -2,12 +2,18 @@ import argparse
 import difflib
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 from typing import Callable, List, Optional, Tuple
 
+from universum.lib import diff
 from . import utils
 
+# Languages supported by uncrustify; files with other extensions are skipped when directories are expanded
+SOURCE_EXTENSIONS = (".c", ".h", ".cc", ".cpp", ".cxx", ".c++", ".hh", ".hpp", ".hxx", ".h++", ".inl",
+                     ".m", ".mm", ".cs", ".d", ".java", ".vala", ".p", ".pawn", ".sma", ".inc")
+
 
 def uncrustify_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Uncrustify analyzer")
@@ -24,7 +30,7 @@ def uncrustify_argument_parser() -> argparse.ArgumentParser:
 
 
 @utils.sys_exit
-@utils.analyzer(uncrustify_argument_parser())
+@utils.analyzer(uncrustify_argument_parser(), extensions=SOURCE_EXTENSIONS)
 def main(settings: argparse.Namespace) -> List[utils.ReportData]:
     if not shutil.which('uncrustify'):
         raise EnvironmentError("Please install uncrustify")
@@ -46,9 +52,11 @@ def main(settings: argparse.Namespace) -> List[utils.ReportData]:
         target_file_absolute: Path = target_folder.joinpath(src_file_relative)
         files.append((src_file_absolute, target_file_absolute))
     cmd = ["uncrustify", "-q", "-c", settings.cfg_file, "--prefix", settings.output_directory]
-    cmd.extend(settings.file_list)
-    utils.run_for_output(cmd)
-    return uncrustify_output_parser(files, html_diff_file_writer)
+    batches: List[List[str]] = utils.balance_shards([[file] for file in settings.file_list], settings.jobs)
+    with ThreadPoolExecutor(max_workers=max(len(batches), 1)) as executor:
+        # list() to re-raise exceptions of each batch
+        list(executor.map(lambda batch: utils.run_for_output(cmd + batch), batches))
+    return uncrustify_output_parser(files, html_diff_file_writer, settings.jobs)
 
 
 class HtmlDiffFileWriter:
@@ -65,20 +73,30 @@ class HtmlDiffFileWriter:
 
 
 def uncrustify_output_parser(files: List[Tuple[Path, Path]],
-                             write_diff_file: Optional[Callable[[Path, List[str], List[str]], None]]
-                             ) -> List[utils.ReportData]:
-    result: List[utils.ReportData] = []
-    for src_file, uncrustify_file in files:
-        with open(src_file) as src:
-            src_lines = src.readlines()
-        with open(uncrustify_file) as fixed:
-            fixed_lines = fixed.readlines()
-
-        issues = _get_issues_from_diff(src_file, src_lines, fixed_lines)
-        if issues and write_diff_file:
-            write_diff_file(src_file, src_lines, fixed_lines)
-        result.extend(issues)
-    return result
+                             write_diff_file: Optional[Callable[[Path, List[str], List[str]], None]],
+                             jobs: int = 1) -> List[utils.ReportData]:
+    tasks = [(src_file, uncrustify_file, write_diff_file) for src_file, uncrustify_file in files]
+    if jobs > 1 and len(tasks) > 1:
+        # Diffing and HTML rendering are CPU-bound, so processes are needed to use several cores
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            file_issues = list(executor.map(_process_file, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+    else:
+        file_issues = [_process_file(task) for task in tasks]
+    return [issue for issues in file_issues for issue in issues]
+
+
+def _process_file(task: Tuple[Path, Path, Optional[Callable[[Path, List[str], List[str]], None]]]
+                  ) -> List[utils.ReportData]:
+    src_file, uncrustify_file, write_diff_file = task
+    with open(src_file) as src:
+        src_lines = src.readlines()
+    with open(uncrustify_file) as fixed:
+        fixed_lines = fixed.readlines()
+
+    issues = _get_issues_from_diff(src_file, src_lines, fixed_lines)
+    if issues and write_diff_file:
+        write_diff_file(src_file, src_lines, fixed_lines)
+    return issues
 
 
 def _get_wrapcolumn_tabsize(cfg_file: str) -> Tuple[int, int]:
@@ -93,8 +111,7 @@ def _get_wrapcolumn_tabsize(cfg_file: str) -> Tuple[int, int]:
 
 def _get_issues_from_diff(src_file: Path, src: List[str], target: List[str]) -> List[utils.ReportData]:
     result = []
-    matching_blocks: List[difflib.Match] = \
-        difflib.SequenceMatcher(a=src, b=target).get_matching_blocks()
+    matching_blocks: List[difflib.Match] = diff.get_matching_blocks(src, target)
     previous_match = matching_blocks[0]
     for match in matching_blocks[1:]:
         block = _get_mismatching_block(previous_match, match, src, target)
@@ -1,16 +1,30 @@
+import functools
+import hashlib
 import json
+import os
 import sys
 import argparse
 import glob
 import pathlib
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Any, Callable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from typing_extensions import TypedDict
 
 from universum.lib.ci_exception import CiException
+from universum.lib.gitignore import GitignoreMatcher
+
+# Set by Universum for the code report steps repeated on the original sources of the change
+ONLY_CHANGED_VARIABLE = "UNIVERSUM_ONLY_CHANGED"
+CACHE_DIR_VARIABLE = "UNIVERSUM_CODE_REPORT_CACHE"
 
 ReportData = TypedDict('ReportData', {'path': str, 'message': str, 'symbol': str, 'line': int})
+ShardingFunction = Callable[[List[str], int], List[List[str]]]
+CacheKeyFunction = Callable[[argparse.Namespace], str]
+DependencyFunction = Callable[[str], Iterable[str]]
+AnalyzerFunction = Callable[[argparse.Namespace], List[ReportData]]
 
 
 class AnalyzerException(CiException):
@@ -19,31 +33,302 @@ class AnalyzerException(CiException):
         self.message: Optional[str] = message
 
 
-def analyzer(parser: argparse.ArgumentParser):
+class Analyzer:
     """
-    Wraps the analyzer specific data and adds common protocol information:
-      --files argument and its processing
+    Analyzer function along with its arguments definition; adds common protocol information:
+      --files argument and its processing, including --gitignore and --only-changed filtering
       --result-file argument and its processing
+      --jobs argument and splitting the analysis into parallel runs
+      --cache-dir argument and reusing results for unchanged files
+    Called without arguments, parses command line and runs the analysis; settings may also be parsed
+    from a custom argument list, e.g. for running several analyzers in one process
+    """
+
+    def __init__(self, func: AnalyzerFunction, parser: argparse.ArgumentParser, sharding: Optional[ShardingFunction],
+                 cache_key: Optional[CacheKeyFunction], extensions: Optional[Tuple[str, ...]], *,
+                 cache_dependencies: Optional[DependencyFunction] = None) -> None:
+        self.func: AnalyzerFunction = func
+        self.parser: argparse.ArgumentParser = parser
+        self.sharding: Optional[ShardingFunction] = sharding
+        self.cache_key: Optional[CacheKeyFunction] = cache_key
+        self.extensions: Optional[Tuple[str, ...]] = extensions
+        self.cache_dependencies: Optional[DependencyFunction] = cache_dependencies
+        add_files_argument(parser)
+        add_result_file_argument(parser)
+        add_jobs_argument(parser)
+        if cache_key:
+            add_cache_arguments(parser)
+
+    def parse_settings(self, args: Optional[List[str]] = None,
+                       discovery: Optional["FileDiscovery"] = None) -> argparse.Namespace:
+        settings: argparse.Namespace = self.parser.parse_args(args)
+        (discovery or FileDiscovery()).expand(settings, self.extensions)
+        expand_jobs_argument(settings)
+        return settings
+
+    def run(self, settings: argparse.Namespace) -> List[ReportData]:
+        if not settings.file_list:
+            return []  # e.g. none of the changed files is of the analyzer type; analyzers fail on empty file list
+        if self.sharding and settings.jobs > 1 and len(settings.file_list) > 1:
+            return run_sharded(self.func, settings, self.sharding(settings.file_list, settings.jobs))
+        return self.func(settings)
+
+    def analyze(self, settings: argparse.Namespace) -> List[ReportData]:
+        issues: List[ReportData]
+        if self.cache_key and settings.cache_dir:
+            cache = ResultCache(settings.cache_dir, self.cache_key(settings), dependencies=self.cache_dependencies)
+            issues = run_cached(self.run, settings, cache)
+        else:
+            issues = self.run(settings)
+        report_to_file(issues, settings.result_file)
+        return issues
+
+    def __call__(self) -> List[ReportData]:
+        return self.analyze(self.parse_settings())
+
+
+def analyzer(parser: argparse.ArgumentParser, sharding: Optional[ShardingFunction] = None,
+             cache_key: Optional[CacheKeyFunction] = None,
+             extensions: Optional[Tuple[str, ...]] = None,
+             cache_dependencies: Optional[DependencyFunction] = None) -> Callable[[AnalyzerFunction], Analyzer]:
+    """
+    Wraps the analyzer specific data and adds common protocol information, see `Analyzer`
     This function exists to define analyzer report interface
 
     :param parser: Definition of analyzer custom arguments
+    :param sharding: Function splitting file list into the given number of parts, that can be analyzed
+                     independently; if not set, the analyzer is always launched once for all files
+    :param cache_key: Function returning a string that identifies analyzer version and configuration;
+                      if set, results are cached separately for each Python file, so it may only be set
+                      for analyzers whose results for a file do not depend on the other files,
+                      except for the ones returned by `cache_dependencies`
+    :param extensions: Extensions of the files to take when directories are expanded for filtering;
+                       if not set, all files are taken
+    :param cache_dependencies: Function returning the files the results of the given file depend on,
+                               such as the modules it imports; their contents are a part of the cache key
     :return: Wrapped analyzer with common reporting behaviour
     """
-    def internal(func: Callable[[argparse.Namespace], List[ReportData]]) -> Callable[[], List[ReportData]]:
-        def wrapper() -> List[ReportData]:
-            add_files_argument(parser)
-            add_result_file_argument(parser)
-            settings: argparse.Namespace = parser.parse_args()
-            expand_files_argument(settings)
-            issues: List[ReportData] = func(settings)
-            report_to_file(issues, settings.result_file)
-            return issues
-
-        return wrapper
+    def internal(func: AnalyzerFunction) -> Analyzer:
+        return Analyzer(func, parser, sharding, cache_key, extensions, cache_dependencies=cache_dependencies)
 
     return internal
 
 
+def hash_file(path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class ResultCache:
+    """
+    Analysis results of separate files, stored in a local directory. The entries are identified
+    by the hash of file path, file contents, contents of the files it depends on (if `dependencies` are set)
+    and analyzer identity; the least recently used entries are removed when total size of the cache exceeds the limit
+
+    >>> cache_dir = tempfile.TemporaryDirectory()
+    >>> source = os.path.join(cache_dir.name, "source.py")
+    >>> with open(source, "w") as f:
+    ...     _ = f.write("print()")
+    >>> cache = ResultCache(os.path.join(cache_dir.name, "cache"), "analyzer 1.0")
+    >>> cache.load(source) is None
+    True
+    >>> cache.store(source, [ReportData(path=source, line=1, symbol="symbol", message="message")])
+    >>> cache.load(source)[0]["line"]
+    1
+    >>> ResultCache(os.path.join(cache_dir.name, "cache"), "analyzer 2.0").load(source) is None
+    True
+    >>> cache_dir.cleanup()
+    """
+
+    def __init__(self, cache_dir: str, analyzer_key: str, size_limit: int = 256 * 1024 * 1024,
+                 dependencies: Optional[DependencyFunction] = None) -> None:
+        self.cache_dir: str = cache_dir
+        self.analyzer_key: str = analyzer_key
+        self.size_limit: int = size_limit
+        self.dependencies: Optional[DependencyFunction] = dependencies
+        self.keys: Dict[str, str] = {}
+        self.hashes: Dict[str, str] = {}
+
+    def hash_dependency(self, path: str) -> str:
+        if path not in self.hashes:
+            self.hashes[path] = hash_file(path) if os.path.isfile(path) else ""
+        return self.hashes[path]
+
+    def entry_path(self, file: str) -> str:
+        if file not in self.keys:
+            parts: List[str] = [self.analyzer_key, str(normalize(file)), hash_file(file)]
+            if self.dependencies is not None:
+                parts.extend(f"{path}\0{self.hash_dependency(path)}" for path in sorted(self.dependencies(file)))
+            key = "\0".join(parts)
+            self.keys[file] = hashlib.sha256(key.encode("utf-8", "surrogateescape")).hexdigest()
+        key = self.keys[file]
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def load(self, file: str) -> Optional[List[ReportData]]:
+        path = self.entry_path(file)
+        try:
+            with open(path, encoding="utf-8") as f:
+                issues: List[ReportData] = json.load(f)
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return issues
+
+    def store(self, file: str, issues: List[ReportData]) -> None:
+        path = self.entry_path(file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Writing to a temporary file and renaming, so that parallel runs never read incomplete entries
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path), delete=False) as f:
+            json.dump(issues, f)
+        os.replace(f.name, path)
+
+    def evict(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.size_limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+
+def run_cached(run: AnalyzerFunction, settings: argparse.Namespace,
+               cache: ResultCache) -> List[ReportData]:
+    cache.size_limit = settings.cache_size * 1024 * 1024
+    cached_issues: List[ReportData] = []
+    changed_files: List[str] = []
+    for file in expand_python_files(settings.file_list):
+        issues = cache.load(file)
+        if issues is None:
+            changed_files.append(file)
+        else:
+            cached_issues.extend(issues)
+
+    new_issues: List[ReportData] = []
+    if changed_files:
+        new_issues = run(argparse.Namespace(**dict(vars(settings), file_list=changed_files)))
+        issues_by_file: Dict[pathlib.Path, List[ReportData]] = {normalize(file): [] for file in changed_files}
+        for issue in new_issues:
+            issues_by_file.setdefault(normalize(issue["path"]), []).append(issue)
+        for file in changed_files:
+            cache.store(file, issues_by_file[normalize(file)])
+    cache.evict()
+    return merge_reports([cached_issues, new_issues])
+
+
+def run_sharded(func: AnalyzerFunction, settings: argparse.Namespace,
+                shards: List[List[str]]) -> List[ReportData]:
+    # Analyzers spend their time in subprocesses, so threads are enough to load all the cores;
+    # number of the part is passed along for analyzers keeping state per part between runs
+    shard_settings = [argparse.Namespace(**dict(vars(settings), file_list=shard, shard=number))
+                      for number, shard in enumerate(shard for shard in shards if shard)]
+    with ThreadPoolExecutor(max_workers=len(shard_settings)) as executor:
+        results = list(executor.map(func, shard_settings))
+    return merge_reports(results)
+
+
+def merge_reports(reports: List[List[ReportData]]) -> List[ReportData]:
+    """
+    Combine results of several analyzer runs, removing the issues reported by more than one run
+    and sorting the result, so that it does not depend on the way the files were distributed
+
+    >>> def issue(path, line):
+    ...     return ReportData(path=path, line=line, symbol="symbol", message="message")
+    >>> first = [issue("b.py", 1), issue("a.py", 2)]
+    >>> second = [issue("a.py", 2), issue("a.py", 1)]
+    >>> [(item["path"], item["line"]) for item in merge_reports([first, second])]
+    [('a.py', 1), ('a.py', 2), ('b.py', 1)]
+    """
+    unique: Dict[Tuple[str, int, str, str], ReportData] = {}
+    for report in reports:
+        for issue in report:
+            unique.setdefault((issue["path"], issue["line"], issue["symbol"], issue["message"]), issue)
+    return [unique[key] for key in sorted(unique)]
+
+
+def balance_shards(groups: List[List[str]], jobs: int) -> List[List[str]]:
+    """
+    Distribute groups of files into the given number of shards with total file sizes as close as possible,
+    placing largest groups first; each group is kept within one shard
+
+    >>> balance_shards([["a"], ["b"], ["c"]], 5)
+    [['a'], ['b'], ['c']]
+    """
+    def group_size(group: List[str]) -> int:
+        return sum(os.path.getsize(path) for path in group if os.path.isfile(path))
+
+    sized_groups = sorted(((group_size(group), group) for group in groups), key=lambda item: -item[0])
+    shards: List[List[str]] = [[] for _ in range(min(jobs, len(groups)))]
+    # Number of files is compared as well, for the files of the same size to be spread evenly
+    shard_loads: List[Tuple[int, int]] = [(0, 0)] * len(shards)
+    for size, group in sized_groups:
+        smallest = shard_loads.index(min(shard_loads))
+        shards[smallest].extend(group)
+        shard_loads[smallest] = (shard_loads[smallest][0] + size, shard_loads[smallest][1] + len(group))
+    return shards
+
+
+def expand_python_files(paths: List[str]) -> List[str]:
+    result: List[str] = []
+    for path in paths:
+        if not os.path.isdir(path):
+            result.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            result.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.endswith(".py"))
+    return result
+
+
+def shard_per_file(files: List[str], jobs: int) -> List[List[str]]:
+    """
+    Sharding for analyzers checking each file independently: directories are expanded to Python files,
+    and every file can be analyzed in any shard
+    """
+    return balance_shards([[path] for path in expand_python_files(files)], jobs)
+
+
+def get_top_package(path: str) -> str:
+    """
+    Outermost directory of the Python package the file belongs to, or the file itself if it is not in a package
+    """
+    path = os.path.abspath(path)
+    top_package = path
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    while os.path.isfile(os.path.join(directory, "__init__.py")):
+        top_package = directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return top_package
+
+
+def shard_per_package(files: List[str], jobs: int) -> List[List[str]]:
+    """
+    Sharding for analyzers that need modules of one package to be analyzed together: files are grouped
+    by their top-level package, and each package is analyzed in a single shard
+    """
+    packages: Dict[str, List[str]] = {}
+    for path in expand_python_files(files):
+        packages.setdefault(get_top_package(path), []).append(path)
+    return balance_shards(list(packages.values()), jobs)
+
+
 def sys_exit(func: Callable[[], Any]) -> Callable[[], None]:
     """
     Execute target function, wrapping any generated exceptions and reporting them to system output
@@ -89,7 +374,8 @@ def sys_exit(func: Callable[[], Any]) -> Callable[[], None]:
                 sys.stderr.write(str(e))
         sys.exit(exit_code)
 
-    return wrapper
+    # Wrapped analyzer is available as '__wrapped__', for running it without exiting
+    return functools.update_wrapper(wrapper, func, assigned=(), updated=())
 
 
 def run_for_output(cmd: List[str]) -> Tuple[str, str]:
@@ -103,15 +389,121 @@ def run_for_output(cmd: List[str]) -> Tuple[str, str]:
 
 def add_files_argument(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--files", dest="file_list", nargs='+', required=True,
-                        help="Target file or directory; accepts multiple values; ")
+                        help="Target file or directory; accepts multiple values; "
+                             "'**' in patterns matches any files and directories recursively")
+    parser.add_argument("--gitignore", dest="gitignore", action="store_true",
+                        help="Skip files and directories ignored by '.gitignore' files of the repository; "
+                             "directories are expanded to the files that are not ignored")
+    parser.add_argument("--only-changed", dest="only_changed", nargs="?", const="", metavar="DIFF_FILE",
+                        default=os.environ.get(ONLY_CHANGED_VARIABLE),
+                        help="Only analyze files changed in the checked review, as listed by "
+                             "'universum api file-diff'; the file diff is requested from Universum running "
+                             "the analyzer, or read from DIFF_FILE with output of this command, if set. "
+                             "Directories are replaced with the changed files they contain. "
+                             f"Default is DIFF_FILE from '{ONLY_CHANGED_VARIABLE}' environment variable, if set")
+
+
+def get_changed_files(diff_file: str) -> Optional[Set[str]]:
+    """
+    :return: Absolute paths of added and modified files, or None if the file diff is not known
+    """
+    if diff_file:
+        with open(diff_file, encoding="utf-8") as f:
+            output = f.read()
+    else:
+        output, _ = run_for_output([sys.executable, "-m", "universum", "api", "file-diff"])
+    entries = json.loads(output) if output.strip() else None
+    if not isinstance(entries, list):  # VCS types not supporting file diff provide empty dict
+        return None
+    return {os.path.normpath(entry["local_path"]) for entry in entries if entry.get("action") != "delete"}
+
+
+def select_files(paths: List[str], extensions: Optional[Tuple[str, ...]], ignored: Optional[GitignoreMatcher],
+                 changed: Optional[Set[str]]) -> List[str]:
+    result: Dict[str, None] = {}  # ordered set
+    for path in paths:
+        absolute = os.path.abspath(path)
+        candidates: List[str]
+        if not os.path.isdir(path):
+            candidates = [path] if changed is None or absolute in changed else []
+        elif changed is not None:
+            # Changed files are taken from the diff instead of walking the whole directory
+            prefix = os.path.join(absolute, "")
+            candidates = [os.path.join(path, os.path.relpath(file, absolute))
+                          for file in sorted(changed) if file.startswith(prefix) and os.path.isfile(file)]
+        elif ignored is not None:
+            candidates = ignored.walk(path)
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate != path and extensions and not candidate.endswith(extensions):
+                continue
+            if ignored is None or not ignored.is_ignored(candidate):
+                result[candidate] = None
+    return list(result)
+
+
+class FileDiscovery:
+    """
+    Expansion of '--files' argument: glob patterns, '.gitignore' rules and the file diff are processed once
+    and reused for all the analyzers which settings are parsed with the same instance
+    """
+
+    def __init__(self) -> None:
+        self.patterns: Dict[str, List[str]] = {}
+        self.ignored: Optional[GitignoreMatcher] = None
+        self.changed: Dict[str, Optional[Set[str]]] = {}
+
+    def glob(self, pattern: str) -> List[str]:
+        if pattern not in self.patterns:
+            self.patterns[pattern] = glob.glob(pattern, recursive=True)
+        return self.patterns[pattern]
+
+    def get_ignored(self) -> GitignoreMatcher:
+        if self.ignored is None:
+            self.ignored = GitignoreMatcher()
+        return self.ignored
+
+    def get_changed(self, diff_file: str) -> Optional[Set[str]]:
+        if diff_file not in self.changed:
+            self.changed[diff_file] = get_changed_files(diff_file)
+        return self.changed[diff_file]
+
+    def expand(self, settings: argparse.Namespace, extensions: Optional[Tuple[str, ...]] = None) -> None:
+        # TODO: subclass argparse.Action
+        result = []
+        for pattern in settings.file_list:
+            result.extend(self.glob(pattern))
+        ignored: Optional[GitignoreMatcher] = self.get_ignored() if settings.gitignore else None
+        changed: Optional[Set[str]] = None
+        if settings.only_changed is not None:
+            changed = self.get_changed(settings.only_changed)
+        if ignored is not None or changed is not None:
+            result = select_files(result, extensions, ignored, changed)
+        settings.file_list = result
+
+
+def add_jobs_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--jobs", "-j", dest="jobs", type=int, default=1,
+                        help="Number of analyzer processes to run in parallel, each checking its own part of "
+                             "the files; set to 0 to use the number of CPU cores. Analyzers that cannot split "
+                             "the analysis ignore this option. Default is 1")
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache-dir", dest="cache_dir", default=os.environ.get(CACHE_DIR_VARIABLE),
+                        help="Directory to cache analysis results of each file in. If set, only the files "
+                             "changed since they were cached (or analyzed with different analyzer version "
+                             f"or configuration) are passed to the analyzer. Default is '{CACHE_DIR_VARIABLE}' "
+                             "environment variable, if set")
+    parser.add_argument("--cache-size", dest="cache_size", type=int, default=256,
+                        help="Maximum size of the cache directory in megabytes; least recently used "
+                             "results are removed when the cache grows bigger. Default is 256")
 
 
-def expand_files_argument(settings: argparse.Namespace) -> None:
-    # TODO: subclass argparse.Action
-    result = []
-    for pattern in settings.file_list:
-        result.extend(glob.glob(pattern))
-    settings.file_list = result
+def expand_jobs_argument(settings: argparse.Namespace) -> None:
+    if settings.jobs < 1:
+        settings.jobs = os.cpu_count() or 1
 
 
 def add_result_file_argument(parser: argparse.ArgumentParser) -> None:
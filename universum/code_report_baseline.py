@@ -0,0 +1,57 @@
+import json
+import os
+from typing import Any, Dict, Iterator
+
+from .lib import utils
+from .lib.gravity import Module
+from .lib.issue_baseline import Fingerprinter, IssueBaseline
+from .lib.json_stream import JsonArrayReader
+from .lib.module_arguments import ModuleArgumentParser
+from .modules.output.output import MinimalOut
+
+__all__ = ["CodeReportBaseline"]
+
+
+class CodeReportBaseline(Module):
+    description: str = "Create code report baseline"
+
+    @staticmethod
+    def define_arguments(parser: ModuleArgumentParser) -> None:
+        parser.add_argument("reports", nargs="+", metavar="REPORT",
+                            help="Code report files to take the issues from: either analyser result files, "
+                                 "or 'Static_analysis_report.jsonl' artifact of a Universum run")
+        parser.add_argument("--baseline-file", "-bf", dest="baseline_file", metavar="BASELINE_FILE", required=True,
+                            help="File to write the baseline to, for passing it to '--code-report-baseline'")
+        parser.add_argument("--source-dir", "-sd", dest="source_dir", metavar="SOURCE_DIR",
+                            help="Directory with the analysed sources, that issue paths are relative to. "
+                                 "Sources must be in the same state as when the reports were created. "
+                                 "Default is current directory")
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.out = MinimalOut()
+
+    @staticmethod
+    def read_issues(report_file: str) -> Iterator[Dict[str, Any]]:
+        with open(report_file, encoding="utf-8") as f:
+            if report_file.endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from JsonArrayReader(f)
+
+    def execute(self) -> None:
+        source_dir: str = utils.parse_path(self.settings.source_dir or ".", os.getcwd())
+        fingerprinter = Fingerprinter(source_dir)
+        baseline = IssueBaseline()
+        for report_file in self.settings.reports:
+            for issue in self.read_issues(report_file):
+                baseline.counts[fingerprinter.fingerprint(issue)] += 1
+
+        baseline_file: str = utils.parse_path(self.settings.baseline_file, os.getcwd())
+        baseline.save(baseline_file)
+        self.out.log(f"Baseline of {sum(baseline.counts.values())} issues is written to '{baseline_file}'")
+
+    def finalize(self) -> None:
+        pass
@@ -0,0 +1,159 @@
+from difflib import Match, SequenceMatcher
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+__all__ = [
+    "get_matching_blocks"
+]
+
+# Regions with fewer compared pairs than this are aligned by difflib, that finds the longest matches;
+# larger regions are split by unique (or rarest) lines first, as in patience and histogram diff
+SMALL_REGION_SIZE = 10000
+# Lines repeated more times are not used for splitting, same as in git histogram diff: regions consisting
+# only of such lines are reported as changed as a whole instead of being aligned in quadratic time
+MAX_OCCURRENCES = 64
+
+Region = Tuple[int, int, int, int]  # a_start, a_end, b_start, b_end
+
+
+def longest_increasing_subsequence(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Longest subsequence of pairs (ordered by first element) with increasing second elements
+
+    >>> longest_increasing_subsequence([(0, 3), (1, 0), (2, 1), (3, 4), (4, 2)])
+    [(1, 0), (2, 1), (4, 2)]
+    """
+    tails: List[int] = []  # tails[k] is the index of the smallest tail of increasing subsequence of length k + 1
+    tail_values: List[int] = []
+    previous: List[int] = [-1] * len(pairs)
+    for index, (_, value) in enumerate(pairs):
+        low, high = 0, len(tail_values)
+        while low < high:
+            middle = (low + high) // 2
+            if tail_values[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+            tail_values.append(value)
+        else:
+            tails[low] = index
+            tail_values[low] = value
+
+    result: List[Tuple[int, int]] = []
+    index = tails[-1] if tails else -1
+    while index >= 0:
+        result.append(pairs[index])
+        index = previous[index]
+    return result[::-1]
+
+
+def find_anchors(a: Sequence[Hashable], b: Sequence[Hashable], region: Region) -> List[Tuple[int, int]]:
+    a_start, a_end, b_start, b_end = region
+    a_positions: Dict[Hashable, List[int]] = {}
+    for index in range(a_start, a_end):
+        a_positions.setdefault(a[index], []).append(index)
+    b_positions: Dict[Hashable, List[int]] = {}
+    for index in range(b_start, b_end):
+        if b[index] in a_positions:
+            b_positions.setdefault(b[index], []).append(index)
+    if not b_positions:
+        return []
+
+    unique = sorted((positions[0], b_positions[item][0]) for item, positions in a_positions.items()
+                    if len(positions) == 1 and len(b_positions.get(item, ())) == 1)
+    if unique:
+        return longest_increasing_subsequence(unique)
+
+    # No unique lines: fall back to the rarest common line, as histogram diff does
+    rarest = min(b_positions, key=lambda item: (len(a_positions[item]) + len(b_positions[item]),
+                                                a_positions[item][0]))
+    if len(a_positions[rarest]) + len(b_positions[rarest]) > MAX_OCCURRENCES:
+        return []
+    return [(a_positions[rarest][0], b_positions[rarest][0])]
+
+
+def strip_common_ends(a: Sequence[Hashable], b: Sequence[Hashable], region: Region,
+                      matches: List[Tuple[int, int, int]]) -> Region:
+    """
+    Match common prefix and suffix of the region, and return the rest of it
+
+    >>> matches = []
+    >>> strip_common_ends("abxcd", "abycd", (0, 5, 0, 5), matches), matches
+    ((2, 3, 2, 3), [(0, 0, 2), (3, 3, 2)])
+    """
+    a_start, a_end, b_start, b_end = region
+    prefix = 0
+    while a_start + prefix < a_end and b_start + prefix < b_end and a[a_start + prefix] == b[b_start + prefix]:
+        prefix += 1
+    if prefix:
+        matches.append((a_start, b_start, prefix))
+        a_start += prefix
+        b_start += prefix
+    suffix = 0
+    while a_start < a_end - suffix and b_start < b_end - suffix and a[a_end - suffix - 1] == b[b_end - suffix - 1]:
+        suffix += 1
+    if suffix:
+        a_end -= suffix
+        b_end -= suffix
+        matches.append((a_end, b_end, suffix))
+    return a_start, a_end, b_start, b_end
+
+
+def get_matching_blocks(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Match]:
+    """
+    Same as `difflib.SequenceMatcher(a=a, b=b).get_matching_blocks()`, but in near-linear time:
+    common prefix and suffix are matched first, the rest is split by lines unique to both sequences
+    (patience diff), or by the rarest common lines if there are no unique ones (histogram diff),
+    and only small regions between such anchors are aligned by difflib. The result is a list
+    of non-overlapping matches, ordered and terminated by `Match(len(a), len(b), 0)`
+
+    >>> get_matching_blocks("abxcd", "abcyd")
+    [Match(a=0, b=0, size=2), Match(a=3, b=2, size=1), Match(a=4, b=4, size=1), Match(a=5, b=5, size=0)]
+    >>> lines = [f"line {number}" for number in range(100)]
+    >>> get_matching_blocks(lines, lines[:50] + ["inserted"] + lines[50:])
+    [Match(a=0, b=0, size=50), Match(a=50, b=51, size=50), Match(a=100, b=101, size=0)]
+    >>> get_matching_blocks([], ["a"])
+    [Match(a=0, b=1, size=0)]
+    """
+    matches: List[Tuple[int, int, int]] = []
+    regions: List[Region] = [(0, len(a), 0, len(b))]
+    while regions:
+        a_start, a_end, b_start, b_end = strip_common_ends(a, b, regions.pop(), matches)
+        if a_start == a_end or b_start == b_end:
+            continue
+
+        if (a_end - a_start) * (b_end - b_start) <= SMALL_REGION_SIZE:
+            matcher = SequenceMatcher(None, a[a_start:a_end], b[b_start:b_end], autojunk=False)
+            matches.extend((a_start + match.a, b_start + match.b, match.size)
+                           for match in matcher.get_matching_blocks() if match.size)
+            continue
+
+        anchors = find_anchors(a, b, (a_start, a_end, b_start, b_end))
+        for a_anchor, b_anchor in anchors:
+            regions.append((a_start, a_anchor, b_start, b_anchor))
+            matches.append((a_anchor, b_anchor, 1))
+            a_start, b_start = a_anchor + 1, b_anchor + 1
+        if anchors:
+            regions.append((a_start, a_end, b_start, b_end))
+
+    return merge_matches(matches, len(a), len(b))
+
+
+def merge_matches(matches: List[Tuple[int, int, int]], a_length: int, b_length: int) -> List[Match]:
+    """
+    Sort matches, join adjacent ones and append the terminating match
+
+    >>> merge_matches([(3, 3, 2), (0, 0, 2), (2, 2, 1)], 5, 6)
+    [Match(a=0, b=0, size=5), Match(a=5, b=6, size=0)]
+    """
+    result: List[Match] = []
+    for a_index, b_index, size in sorted(matches):
+        if result and result[-1].a + result[-1].size == a_index and result[-1].b + result[-1].size == b_index:
+            result[-1] = Match(result[-1].a, result[-1].b, result[-1].size + size)
+        else:
+            result.append(Match(a_index, b_index, size))
+    result.append(Match(a_length, b_length, 0))
+    return result
@@ -0,0 +1,140 @@
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+import datetime
+import hashlib
+import os
+import stat
+
+__all__ = [
+    "write_file_list",
+    "write_file_digest"
+]
+
+
+def format_entry(entry: os.DirEntry) -> str:
+    """
+    One line of the listing, similar to 'ls -l' output
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     with open(os.path.join(directory, "file.txt"), "w") as f:
+    ...         _ = f.write("text")
+    ...     os.symlink("file.txt", os.path.join(directory, "link"))
+    ...     lines = [format_entry(entry) for entry in sorted(os.scandir(directory), key=lambda e: e.name)]
+    >>> lines[0].split()[0][0], lines[0].split()[2], lines[0].split()[-1]
+    ('-', '4', 'file.txt')
+    >>> lines[1].split()[0][0], lines[1].split()[-3:]
+    ('l', ['link', '->', 'file.txt'])
+    """
+    try:
+        info = entry.stat(follow_symlinks=False)
+    except OSError as error:
+        return f"?????????? {entry.name} ({error.strerror})"
+    modified = datetime.datetime.fromtimestamp(info.st_mtime).strftime("%Y-%m-%d %H:%M")
+    line = f"{stat.filemode(info.st_mode)} {info.st_nlink:>3} {info.st_size:>10} {modified} {entry.name}"
+    if entry.is_symlink():
+        try:
+            line += " -> " + os.readlink(entry.path)
+        except OSError:
+            pass
+    return line
+
+
+def walk(root: str, max_depth: Optional[int],
+         on_error: Callable[[str, OSError], None]) -> Iterator[Tuple[str, int, List[os.DirEntry]]]:
+    # Same order as 'ls -R': directory contents first, then each subdirectory in turn;
+    # explicit stack instead of recursion to survive arbitrarily deep trees
+    stack: List[Tuple[str, int]] = [(root, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            with os.scandir(path) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as error:
+            on_error(path, error)
+            continue
+        yield path, depth, entries
+        if max_depth is not None and depth >= max_depth:
+            continue
+        subdirectories = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+        stack.extend((subdirectory, depth + 1) for subdirectory in reversed(subdirectories))
+
+
+def write_file_list(root: str, output: TextIO, max_depth: Optional[int] = None,
+                    max_entries: Optional[int] = None) -> int:
+    """
+    Write 'ls -lR'-like listing of the directory without gathering it in memory first
+
+    :param root: directory to list
+    :param output: text stream to write the listing to
+    :param max_depth: number of nested directory levels to descend into; None for unlimited
+    :param max_entries: number of entries after which the listing is cut; None for unlimited
+    :return: number of listed entries
+    """
+    count = 0
+
+    def report_error(path: str, error: OSError) -> None:
+        output.write(f"{path}: cannot open directory: {error.strerror}\n\n")
+
+    for path, depth, entries in walk(root, max_depth, report_error):
+        output.write(f"{path}:\n")
+        for entry in entries:
+            if max_entries is not None and count >= max_entries:
+                output.write(f"\nListing is truncated after {max_entries} entries\n")
+                return count
+            output.write(format_entry(entry) + "\n")
+            count += 1
+        if max_depth is not None and depth >= max_depth and any(entry.is_dir(follow_symlinks=False)
+                                                                for entry in entries):
+            output.write("(subdirectories are not listed: maximum depth reached)\n")
+        output.write("\n")
+    return count
+
+
+def summarize_tree(root: str, max_depth: Optional[int]) -> Tuple[Dict[str, List[int]], int, str]:
+    tree_hash = hashlib.sha256()
+    summary: Dict[str, List[int]] = {}  # top-level entry name -> [files, directories, bytes]
+    errors = 0
+
+    def count_error(_path: str, _error: OSError) -> None:
+        nonlocal errors
+        errors += 1
+
+    for path, _, entries in walk(root, max_depth, count_error):
+        relative_path = os.path.relpath(path, root)
+        for entry in entries:
+            relative_name = entry.name if relative_path == os.curdir else os.path.join(relative_path, entry.name)
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except OSError:
+                errors += 1
+                continue
+            state = f"{relative_name}\0{info.st_mode}\0{info.st_size}\0{info.st_mtime_ns}\n"
+            tree_hash.update(state.encode("utf-8", "surrogateescape"))
+            totals = summary.setdefault(relative_name.split(os.sep, 1)[0], [0, 0, 0])
+            if stat.S_ISDIR(info.st_mode):
+                totals[1] += 1
+            else:
+                totals[0] += 1
+                totals[2] += info.st_size
+    return summary, errors, tree_hash.hexdigest()
+
+
+def write_file_digest(root: str, output: TextIO, max_depth: Optional[int] = None) -> None:
+    """
+    Write a compact summary of the directory instead of the full listing: number of files,
+    directories and total size for each top-level entry, and a hash of the whole tree state
+    (names, types, sizes and modification times) to detect any difference between two runs
+    """
+    summary, errors, digest = summarize_tree(root, max_depth)
+
+    output.write(f"{root}:\n")
+    for name in sorted(summary):
+        files, directories, size = summary[name]
+        output.write(f"{files:>10} files {directories:>8} directories {size:>14} bytes  {name}\n")
+    files, directories, size = (sum(column) for column in zip([0, 0, 0], *summary.values()))
+    output.write(f"\n{files} files, {directories} directories, {size} bytes in total\n")
+    if max_depth is not None:
+        output.write(f"Directories deeper than {max_depth} level(s) are not included\n")
+    if errors:
+        output.write(f"{errors} entries could not be read\n")
+    output.write(f"Tree digest (sha256): {digest}\n")
@@ -0,0 +1,165 @@
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+import os
+import re
+
+__all__ = [
+    "GitignoreMatcher",
+    "compile_pattern"
+]
+
+Rule = Tuple[Pattern, bool, bool]  # regular expression, negation, matches only directories
+
+
+def translate_glob(pattern: str) -> str:
+    result: List[str] = []
+    index: int = 0
+    while index < len(pattern):
+        if pattern.startswith("**/", index):
+            result.append("(?:.*/)?")
+            index += 3
+        elif pattern.startswith("/**", index) and index + 3 == len(pattern):
+            result.append("/.*")
+            index += 3
+        elif pattern[index] == "*":
+            result.append("[^/]*")
+            index += 1
+        elif pattern[index] == "?":
+            result.append("[^/]")
+            index += 1
+        elif pattern[index] == "[" and "]" in pattern[index + 2:]:
+            end = pattern.index("]", index + 2)
+            content = pattern[index + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            result.append("[" + content.replace("\\", "\\\\") + "]")
+            index = end + 1
+        elif pattern[index] == "\\" and index + 1 < len(pattern):
+            result.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            result.append(re.escape(pattern[index]))
+            index += 1
+    return "".join(result)
+
+
+def compile_pattern(line: str) -> Optional[Rule]:
+    """
+    Convert a line of '.gitignore' file to a rule matching paths relative to the file directory
+
+    >>> regex, negated, directory_only = compile_pattern("!build/")
+    >>> bool(regex.fullmatch("src/build")), negated, directory_only
+    (True, True, True)
+    >>> regex = compile_pattern("/docs/**/*.txt")[0]
+    >>> [bool(regex.fullmatch(path)) for path in ["docs/a.txt", "docs/x/y/a.txt", "src/docs/a.txt"]]
+    [True, True, False]
+    >>> compile_pattern("# comment") is None
+    True
+    """
+    line = line.rstrip("\n")
+    if not line.strip() or line.startswith("#"):
+        return None
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    negated = line.startswith("!")
+    if negated or line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # Patterns with a slash anywhere but at the end are matched against the full relative path
+    if "/" in line:
+        regex = translate_glob(line.lstrip("/"))
+    else:
+        regex = "(?:.*/)?" + translate_glob(line)
+    return re.compile(regex), negated, directory_only
+
+
+class GitignoreMatcher:
+    """
+    Checks paths against '.gitignore' files of the repository, as git does: rules of the deeper
+    files take precedence, the last matching rule of a file wins, and contents of ignored directories
+    cannot be included back. Rules of each directory are read once, on the first request, and each
+    directory tree is walked once as well
+
+    :param root: directory to read '.gitignore' files down from; by default, the root of the git
+                 repository containing current directory, or current directory if there is no repository
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root: str = os.path.abspath(root if root is not None else self.find_repository_root(os.getcwd()))
+        self.rules: Dict[str, List[Rule]] = {}
+        self.ignored_directories: Dict[str, bool] = {}
+        self.walked: Dict[str, List[str]] = {}
+
+    @staticmethod
+    def find_repository_root(path: str) -> str:
+        directory = os.path.abspath(path)
+        while not os.path.exists(os.path.join(directory, ".git")):
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return os.path.abspath(path)
+            directory = parent
+        return directory
+
+    def get_rules(self, directory: str) -> List[Rule]:
+        if directory not in self.rules:
+            rules: List[Rule] = []
+            paths = [os.path.join(directory, ".gitignore")]
+            if directory == self.root:
+                paths.insert(0, os.path.join(directory, ".git", "info", "exclude"))
+            for path in paths:
+                try:
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        rules.extend(rule for rule in map(compile_pattern, f) if rule)
+                except OSError:
+                    pass
+            self.rules[directory] = rules
+        return self.rules[directory]
+
+    def matches(self, path: str, is_directory: bool) -> bool:
+        # Checked from the deepest '.gitignore' up, the first matching rule from the end of a file wins
+        directory = os.path.dirname(path)
+        while True:
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            for regex, negated, directory_only in reversed(self.get_rules(directory)):
+                if (is_directory or not directory_only) and regex.fullmatch(relative):
+                    return not negated
+            parent = os.path.dirname(directory)
+            if directory in (self.root, parent):
+                return False
+            directory = parent
+
+    def is_ignored(self, path: str, is_directory: Optional[bool] = None) -> bool:
+        path = os.path.abspath(path)
+        if path == self.root or not path.startswith(os.path.join(self.root, "")):
+            return False
+        if os.path.basename(path) == ".git":
+            return True
+        if is_directory is None:
+            is_directory = os.path.isdir(path)
+        if is_directory:
+            if path not in self.ignored_directories:
+                self.ignored_directories[path] = self.is_ignored(os.path.dirname(path), True) or \
+                    self.matches(path, True)
+            return self.ignored_directories[path]
+        return self.is_ignored(os.path.dirname(path), True) or self.matches(path, False)
+
+    def walk(self, top: str) -> List[str]:
+        """
+        Files under the directory that are not ignored, in sorted order; ignored subdirectories are not entered
+        """
+        if top not in self.walked:
+            self.walked[top] = list(self.iterate_files(top))
+        return self.walked[top]
+
+    def iterate_files(self, top: str) -> Iterator[str]:
+        if self.is_ignored(top, True):
+            return
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = sorted(name for name in dirnames if not self.is_ignored(os.path.join(dirpath, name), True))
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if not self.is_ignored(path, False):
+                    yield path
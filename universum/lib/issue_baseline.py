@@ -0,0 +1,105 @@
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+import hashlib
+import json
+import os
+import re
+
+__all__ = [
+    "Fingerprinter",
+    "IssueBaseline",
+    "normalize_message"
+]
+
+BASELINE_VERSION = 1
+# Lines around the issue that identify it along with path, symbol and message
+CONTEXT_LINES = 2
+MAX_CACHED_FILES = 64
+
+
+def normalize_message(message: Any) -> str:
+    """
+    Remove the parts of the message that change when unrelated code is edited, such as line numbers
+
+    >>> normalize_message("Line too long (121/120)\\n  at line 12")
+    'Line too long (#/#) at line #'
+    """
+    return " ".join(re.sub(r"\d+", "#", str(message)).split())
+
+
+class Fingerprinter:
+    """
+    Calculates fingerprints of code report issues, that stay the same when the code around
+    the issue is shifted by unrelated changes
+
+    :param project_root: directory the relative paths of the issues are counted from
+    :param replacements: absolute paths of the files to read instead of the files in project root,
+                         e.g. copies of changed files when project root contains original sources
+    """
+
+    def __init__(self, project_root: str, replacements: Optional[Mapping[str, str]] = None) -> None:
+        self.project_root: str = project_root
+        self.replacements: Mapping[str, str] = replacements or {}
+        self.sources: 'OrderedDict[str, List[str]]' = OrderedDict()
+
+    def read_source(self, absolute: str) -> List[str]:
+        if absolute in self.sources:
+            self.sources.move_to_end(absolute)
+            return self.sources[absolute]
+        try:
+            with open(self.replacements.get(absolute, absolute), encoding="utf-8", errors="replace") as f:
+                lines = [line.strip() for line in f]
+        except OSError:
+            lines = []
+        self.sources[absolute] = lines
+        if len(self.sources) > MAX_CACHED_FILES:
+            self.sources.popitem(last=False)
+        return lines
+
+    def fingerprint(self, issue: Mapping[str, Any]) -> str:
+        absolute = os.path.normpath(os.path.join(self.project_root, str(issue.get("path", ""))))
+        try:
+            line = int(issue.get("line", 0))
+        except (TypeError, ValueError):
+            line = 0
+        context: List[str] = []
+        if line > 0:
+            context = self.read_source(absolute)[max(0, line - 1 - CONTEXT_LINES):line + CONTEXT_LINES]
+
+        fields = [os.path.relpath(absolute, self.project_root), str(issue.get("symbol", "")),
+                  normalize_message(issue.get("message", ""))] + context
+        return hashlib.sha1("\0".join(fields).encode("utf-8")).hexdigest()
+
+
+class IssueBaseline:
+    """
+    Multiset of fingerprints of known issues: each occurrence of an issue in the baseline
+    suppresses one occurrence of the same issue in the report
+
+    >>> baseline = IssueBaseline(["a", "a", "b"])
+    >>> [baseline.match(fingerprint) for fingerprint in ["a", "c", "a", "a", "b"]]
+    [True, False, True, False, True]
+    """
+
+    def __init__(self, fingerprints: Iterable[str] = ()) -> None:
+        self.counts: Counter = Counter(fingerprints)
+
+    def match(self, fingerprint: str) -> bool:
+        if self.counts[fingerprint] <= 0:
+            return False
+        self.counts[fingerprint] -= 1
+        return True
+
+    @staticmethod
+    def load(path: str) -> 'IssueBaseline':
+        with open(path, encoding="utf-8") as f:
+            data: Dict[str, Any] = json.load(f)
+        if data.get("version") != BASELINE_VERSION:
+            raise ValueError(f"Unsupported version of code report baseline file '{path}'")
+        baseline = IssueBaseline()
+        baseline.counts.update(data.get("fingerprints", {}))
+        return baseline
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": BASELINE_VERSION, "fingerprints": dict(sorted(self.counts.items()))}, f, indent=4)
@@ -0,0 +1,172 @@
+from typing import Any, IO, Iterator
+import json
+
+__all__ = [
+    "JsonReader",
+    "JsonArrayReader"
+]
+
+WHITESPACE = " \t\n\r"
+
+
+class JsonReader:
+    """
+    Incremental reader of JSON data: containers are walked item by item, and only the values
+    actually requested are decoded, so memory usage does not depend on the document size.
+    Each item or property value yielded by `iterate_array()` or `iterate_object()`
+    must be consumed with `decode_value()`, `skip_value()` or nested iteration
+
+    >>> import io
+    >>> reader = JsonReader(io.StringIO('{"skip": [1, {"a": 2}], "runs": [{"id": 1}, {"id": 2}], "name": "x"}'))
+    >>> for key in reader.iterate_object():
+    ...     if key == "runs":
+    ...         print([reader.decode_value() for _ in reader.iterate_array()])
+    ...     else:
+    ...         reader.skip_value()
+    [{'id': 1}, {'id': 2}]
+    """
+
+    def __init__(self, stream: IO[str], chunk_size: int = 64 * 1024) -> None:
+        self.stream: IO[str] = stream
+        self.chunk_size: int = chunk_size
+        self.decoder: json.JSONDecoder = json.JSONDecoder()
+        self.buffer: str = ""
+        self.position: int = 0
+        self.eof: bool = False
+
+    def read_more(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Consumed part of the buffer is dropped here, so the buffer never grows beyond one item
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def next_symbol(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more(self.chunk_size):
+                return ""
+
+    def expect(self, expected: str) -> None:
+        symbol = self.next_symbol()
+        if symbol != expected:
+            raise ValueError("Unexpected end of JSON data" if not symbol else
+                             f"Expected '{expected}' in JSON data, found '{symbol}'")
+        self.position += 1
+
+    def decode_value(self) -> Any:
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.read_more(size):
+                continue  # end of data reached: decode once more to either succeed or raise
+            size *= 2  # values spanning many chunks are re-parsed a logarithmic number of times
+
+    def skip_value(self) -> None:
+        symbol = self.next_symbol()
+        if symbol == "[":
+            for _ in self.iterate_array():
+                self.skip_value()
+        elif symbol == "{":
+            for _ in self.iterate_object():
+                self.skip_value()
+        else:
+            self.decode_value()
+
+    def iterate_items(self, closing: str) -> Iterator[None]:
+        if self.next_symbol() == closing:
+            self.position += 1
+            return
+        while True:
+            if not self.next_symbol():
+                raise ValueError("Unexpected end of JSON data")
+            yield None
+            symbol = self.next_symbol()
+            self.position += 1
+            if symbol == closing:
+                return
+            if symbol != ",":
+                raise ValueError("Unexpected end of JSON data" if not symbol else
+                                 f"Expected ',' or '{closing}' in JSON data, found '{symbol}'")
+
+    def iterate_array(self) -> Iterator[None]:
+        self.expect("[")
+        yield from self.iterate_items("]")
+
+    def iterate_object(self) -> Iterator[str]:
+        self.expect("{")
+        for _ in self.iterate_items("}"):
+            if self.next_symbol() != '"':
+                raise ValueError("Expected property name in JSON data")
+            key = self.decode_value()
+            self.expect(":")
+            if not self.next_symbol():
+                raise ValueError("Unexpected end of JSON data")
+            yield key
+
+
+class JsonArrayReader(JsonReader):
+    """
+    Reads items of a top-level JSON array one by one, keeping in memory only the item
+    being parsed instead of the whole document
+
+    >>> import io
+    >>> reader = JsonArrayReader(io.StringIO('[{"a": [1, 2]}, "text", 12345, null]'), chunk_size=3)
+    >>> list(reader)
+    [{'a': [1, 2]}, 'text', 12345, None]
+    >>> reader.is_array
+    True
+    >>> reader = JsonArrayReader(io.StringIO(' null '))
+    >>> list(reader), reader.is_array
+    ([], False)
+    >>> list(JsonArrayReader(io.StringIO('[1, 2')))
+    Traceback (most recent call last):
+    ...
+    ValueError: Unexpected end of JSON data
+    """
+
+    def __init__(self, stream: IO[str], chunk_size: int = 64 * 1024) -> None:
+        super().__init__(stream, chunk_size)
+        self.started: bool = False
+        self.is_array: bool = False
+
+    def start(self) -> bool:
+        """
+        Parse the beginning of the document; called implicitly on iteration
+
+        :return: True if the document is an array, False if it is empty or 'null'
+        """
+        if self.started:
+            return self.is_array
+        self.started = True
+        symbol = self.next_symbol()
+        if symbol == "[":
+            self.is_array = True
+            self.position += 1
+        elif symbol:
+            value = self.decode_value()
+            if value is not None or self.next_symbol():
+                raise ValueError("JSON data is not an array")
+        return self.is_array
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.start():
+            return
+        for _ in self.iterate_items("]"):
+            yield self.decode_value()
@@ -1,4 +1,4 @@
-from typing import Any, Callable, List, Optional, TypeVar, Union
+from typing import Any, Callable, Collection, List, Optional, TypeVar, Union
 from types import TracebackType
 import os
 import sys
@@ -53,6 +53,35 @@ def calculate_file_absolute_path(target_directory: str, file_basename: str) -> s
     return os.path.join(target_directory, name)
 
 
+def create_link_tree(source: str, destination: str, excluded: Collection[str]) -> None:
+    """
+    Fill the destination directory with symbolic links to all files of the source directory, except for
+    the ones which paths relative to the source directory are excluded; the destination thus shows the source
+    contents without copying them, and the excluded files can be replaced with other versions
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as destination:
+    ...     for name in ("a.txt", os.path.join("sub", "b.txt"), os.path.join("sub", "c.txt")):
+    ...         os.makedirs(os.path.dirname(os.path.join(source, name)), exist_ok=True)
+    ...         open(os.path.join(source, name), "w").close()
+    ...     create_link_tree(source, destination, [os.path.join("sub", "b.txt")])
+    ...     sorted(os.listdir(destination)), os.listdir(os.path.join(destination, "sub"))
+    ...     os.path.realpath(os.path.join(destination, "a.txt")) == os.path.realpath(os.path.join(source, "a.txt"))
+    (['a.txt', 'sub'], ['c.txt'])
+    True
+    """
+    excluded = {os.path.normpath(path) for path in excluded}
+    for root, directories, files in os.walk(source):
+        relative_root: str = os.path.relpath(root, source)
+        os.makedirs(os.path.join(destination, relative_root), exist_ok=True)
+        # Links to directories are not followed by os.walk(), and are linked same as files
+        links: List[str] = [name for name in directories if os.path.islink(os.path.join(root, name))]
+        for name in files + links:
+            relative: str = os.path.normpath(os.path.join(relative_root, name))
+            if relative not in excluded:
+                os.symlink(os.path.abspath(os.path.join(root, name)), os.path.join(destination, relative))
+
+
 def detect_environment() -> str:
     """
     :return: "tc" if the script is launched on TeamCity agent,
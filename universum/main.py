@@ -1,9 +1,10 @@
-from typing import ClassVar
+from typing import ClassVar, Optional
 from . import __title__
 from .lib.ci_exception import SilentAbortException
 from .lib.gravity import Dependency
 from .lib.module_arguments import ModuleArgumentParser
 from .modules import vcs, artifact_collector, reporter, launcher, code_report_collector
+from .modules.code_report_collector import RepoDiff
 from .modules.output import HasOutput
 from .configuration_support import Configuration
 
@@ -43,6 +44,14 @@ class Main(HasOutput):
                                      help="Only applies to build steps where ``code_report=True``; "
                                           "disables calculating analysis diff for changed files, "
                                           "in this case full analysis report will be published")
+        argument_parser.add_argument("--concurrent-code-report", action="store_true", dest="concurrent_code_report",
+                                     help="Only applies to build steps where ``code_report=True``; "
+                                          "place the original sources to a separate directory before the build "
+                                          "and analyse them in background while the build steps are running, "
+                                          "instead of reverting the change after the build. For Perforce, "
+                                          "unchanged files in that directory are symbolic links to the workspace "
+                                          "files, so steps modifying sources in place (e.g. formatters) also "
+                                          "modify the workspace through these links")
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -75,16 +84,39 @@ class Main(HasOutput):
         self.artifacts.set_and_clean_artifacts(project_configs)
 
         self.reporter.report_build_started()
-        self.launcher.launch_project()
+        # Steps repeated on the original sources, that are executed in background along with the build steps
+        background_configs: Optional[Configuration] = None
+        repo_diff: Optional[RepoDiff] = None
+        if afterall_configs and self.settings.concurrent_code_report and not self.settings.no_diff:
+            if not self.vcs.supports_base_directory():
+                self.out.log("Concurrent code report is disabled because current VCS doesn't support it "
+                             "(e.g. Perforce without shelved changes), code report steps are repeated after the build")
+            else:
+                repo_diff = self.vcs.prepare_base_directory()
+                # Without changed files there is nothing to analyse in background
+                if repo_diff:
+                    self.code_report_collector.prepare_base_analysis(afterall_configs, repo_diff,
+                                                                     self.vcs.get_base_directory(), background=True)
+                    background_configs = afterall_configs
+        # When changed lines are known in advance, results of code report steps are processed as soon as
+        # each of the steps finishes
+        if background_configs is not None or (afterall_configs and self.settings.no_diff):
+            self.code_report_collector.start_incremental_processing(repo_diff)
+        self.launcher.launch_project(background_configs)
         if afterall_configs:
-            if not self.settings.no_diff:
+            if repo_diff is None and not self.settings.no_diff:
                 try:
                     repo_diff = self.vcs.revert_repository()
                 except NotImplementedError:
                     self.out.log("Diff calculation for code report is skipped because current VCS doesn't support it")
                 else:
-                    self.launcher.launch_custom_configs(afterall_configs)
-                    self.code_report_collector.repo_diff = repo_diff
+                    if repo_diff:
+                        self.code_report_collector.prepare_base_analysis(afterall_configs, repo_diff,
+                                                                         self.vcs.get_base_directory())
+                        self.launcher.launch_custom_configs(afterall_configs)
+            if repo_diff is not None and not repo_diff:
+                self.out.log("Code report steps are not repeated on original sources, as no files are changed")
+            self.code_report_collector.repo_diff = repo_diff
             self.code_report_collector.report_code_report_results()
         self.artifacts.collect_artifacts()
         self.reporter.report_build_result()
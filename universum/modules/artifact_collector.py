@@ -1,18 +1,26 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from collections import Counter
+from typing import Any, Dict, IO, List, Optional
 import codecs
-import distutils
-from distutils import dir_util, errors
+import hashlib
+import json
+import math
 import os
 import shutil
+import threading
+import time
 import zipfile
+import zlib
 
 import glob2
 
-from ..configuration_support import Configuration
+from ..configuration_support import Configuration, Step
 from ..lib.ci_exception import CriticalCiException, CiException
 from ..lib.gravity import Dependency
 from ..lib.utils import make_block
 from ..lib import utils
 from .automation_server import AutomationServerForHostingBuild
+from .deferred_deletion import DeferredDeletion
 from .output import HasOutput
 from .project_directory import ProjectDirectory
 from .reporter import Reporter
@@ -25,35 +33,209 @@ __all__ = [
 ]
 
 
-def make_big_archive(target, source):
-    save_cwd = os.getcwd()
-    if source is not None:
-        target = os.path.abspath(target)
-        os.chdir(source)
-    base_dir = os.curdir
-
-    try:
-        filename = target + ".zip"
-        archive_dir = os.path.dirname(target)
-
-        if archive_dir and not os.path.exists(archive_dir):
-            os.makedirs(archive_dir)
-
-        with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED,
-                             allowZip64=True) as zf:
-            path = os.path.normpath(base_dir)
-            zf.write(path, path)
-            for dirpath, dirnames, filenames in os.walk(base_dir):
-                for name in sorted(dirnames):
-                    path = os.path.normpath(os.path.join(dirpath, name))
-                    zf.write(path, path)
-                for name in filenames:
-                    path = os.path.normpath(os.path.join(dirpath, name))
-                    if os.path.isfile(path):
-                        zf.write(path, path)
-    finally:
-        if source is not None:
-            os.chdir(save_cwd)
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Formats that are compressed by design, so deflating them only burns CPU
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".7z", ".aar", ".apk", ".bz2", ".cab", ".deb", ".docx", ".flac", ".gif", ".gz", ".ipa", ".jar", ".jpeg", ".jpg",
+    ".lz4", ".lzma", ".mkv", ".mov", ".mp3", ".mp4", ".ogg", ".png", ".rar", ".rpm", ".squashfs", ".tgz", ".txz",
+    ".webm", ".webp", ".whl", ".xlsx", ".xz", ".zip", ".zst"
+}
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+MIN_ENTROPY_SAMPLE_SIZE = 4 * 1024
+# Bits per byte; deflate gains next to nothing on data above this level (e.g. compressed or encrypted images)
+INCOMPRESSIBLE_ENTROPY = 7.5
+
+
+def get_entropy(sample: bytes) -> float:
+    """
+    Shannon entropy of the data in bits per byte
+
+    >>> get_entropy(b"aaaa")
+    0.0
+    >>> get_entropy(bytes(range(256)))
+    8.0
+    """
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values()) + 0.0
+
+
+def is_incompressible(name: str, first_block: bytes) -> bool:
+    """
+    >>> is_incompressible("images/photo.JPG", b"")
+    True
+    >>> is_incompressible("build.log", b"Compiling..." * 1000)
+    False
+    >>> is_incompressible("firmware.bin", bytes(range(256)) * 64)
+    True
+    >>> is_incompressible("small.bin", bytes(range(256)))
+    False
+    """
+    if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return True
+    sample = first_block[:ENTROPY_SAMPLE_SIZE]
+    if len(sample) < MIN_ENTROPY_SAMPLE_SIZE:
+        return False  # too little data to estimate anything, and too little to save anything
+    return get_entropy(sample) > INCOMPRESSIBLE_ENTROPY
+
+
+class ArchiveStatistics:
+    """
+    Amounts of data stored to archives as is and with compression
+
+    >>> statistics = ArchiveStatistics()
+    >>> statistics.estimate_time_saved()
+    >>> statistics.add(zipfile.ZIP_DEFLATED, 2000, 2.0)
+    >>> statistics.add(zipfile.ZIP_STORED, 1000, 0.1)
+    >>> statistics.estimate_time_saved()
+    0.9
+    """
+
+    def __init__(self) -> None:
+        self.stored_files: int = 0
+        self.stored_bytes: int = 0
+        self.stored_seconds: float = 0.0
+        self.deflated_bytes: int = 0
+        self.deflated_seconds: float = 0.0
+
+    def add(self, compress_type: int, size: int, seconds: float) -> None:
+        if compress_type == zipfile.ZIP_STORED:
+            self.stored_files += 1
+            self.stored_bytes += size
+            self.stored_seconds += seconds
+        else:
+            self.deflated_bytes += size
+            self.deflated_seconds += seconds
+
+    def merge(self, other: 'ArchiveStatistics') -> None:
+        self.stored_files += other.stored_files
+        self.stored_bytes += other.stored_bytes
+        self.stored_seconds += other.stored_seconds
+        self.deflated_bytes += other.deflated_bytes
+        self.deflated_seconds += other.deflated_seconds
+
+    def estimate_time_saved(self) -> Optional[float]:
+        # Deflate speed can only be estimated if anything was actually deflated
+        if not self.stored_bytes or not self.deflated_bytes:
+            return None
+        deflate_speed = self.deflated_bytes / self.deflated_seconds if self.deflated_seconds else math.inf
+        return max(self.stored_bytes / deflate_speed - self.stored_seconds, 0.0)
+
+
+class FileChecksum:
+    """
+    Checksums of the file contents, calculated while the file is being copied
+
+    >>> checksum = FileChecksum(fast_hash=True)
+    >>> checksum.update(b"Some text")
+    >>> checksum.to_dict()
+    {'size': 9, 'sha256': '4c2e9e6da31a64c70623619c449a040968cdbea85945bf384fa30ed2d5d24fa3', 'crc32': 'cd4b3f19'}
+    >>> FileChecksum().to_dict()
+    {'size': 0, 'sha256': 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'}
+    """
+
+    def __init__(self, fast_hash: bool = False) -> None:
+        self.size: int = 0
+        self.sha256 = hashlib.sha256()
+        self.crc32: Optional[int] = 0 if fast_hash else None
+
+    def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+        if self.crc32 is not None:
+            self.crc32 = zlib.crc32(chunk, self.crc32)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"size": self.size, "sha256": self.sha256.hexdigest()}
+        if self.crc32 is not None:
+            result["crc32"] = f"{self.crc32:08x}"
+        return result
+
+
+def copy_stream(source: IO[bytes], destination: IO[bytes], checksum: Optional[FileChecksum] = None) -> None:
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        if checksum:
+            checksum.update(chunk)
+        destination.write(chunk)
+
+
+def copy_file(source: str, destination: str, *, checksums: Optional[Dict[str, FileChecksum]] = None,
+              fast_hash: bool = False, name: Optional[str] = None) -> None:
+    checksum: Optional[FileChecksum] = FileChecksum(fast_hash) if checksums is not None else None
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        copy_stream(source_file, destination_file, checksum)
+    # Only the files actually copied are listed in the manifest
+    if checksums is not None and checksum is not None:
+        checksums[name if name else os.path.basename(source)] = checksum
+
+
+def copy_directory(source: str, destination: str, *, checksums: Optional[Dict[str, FileChecksum]] = None,
+                   fast_hash: bool = False) -> None:
+    def copy_with_checksum(path: str, target: str) -> None:
+        copy_file(path, target, checksums=checksums, fast_hash=fast_hash, name=os.path.relpath(path, source))
+        shutil.copystat(path, target)
+
+    # Symbolic links are followed, same as 'distutils.dir_util.copy_tree' did
+    shutil.copytree(source, destination, symlinks=False, dirs_exist_ok=True, copy_function=copy_with_checksum)
+
+
+def add_file_to_archive(archive: zipfile.ZipFile, path: str, member_name: str, *,
+                        checksums: Optional[Dict[str, FileChecksum]], fast_hash: bool,
+                        statistics: ArchiveStatistics, compress_all: bool) -> None:
+    checksum: Optional[FileChecksum] = FileChecksum(fast_hash) if checksums is not None else None
+
+    # Member contents are streamed manually to calculate checksums in the same read
+    with open(path, "rb") as source_file:
+        first_chunk = source_file.read(COPY_CHUNK_SIZE)
+        member = zipfile.ZipInfo.from_file(path, member_name)
+        member.compress_type = zipfile.ZIP_DEFLATED
+        if not compress_all and is_incompressible(member_name, first_chunk):
+            member.compress_type = zipfile.ZIP_STORED
+
+        started = time.monotonic()
+        with archive.open(member, "w") as member_file:
+            if checksum:
+                checksum.update(first_chunk)
+            member_file.write(first_chunk)
+            copy_stream(source_file, member_file, checksum)
+        statistics.add(member.compress_type, member.file_size, time.monotonic() - started)
+    if checksums is not None and checksum is not None:
+        checksums[member_name] = checksum
+
+
+def make_big_archive(target, source, *, checksums: Optional[Dict[str, FileChecksum]] = None, fast_hash: bool = False,
+                     statistics: Optional[ArchiveStatistics] = None, compress_all: bool = False):
+    # No 'os.chdir' here: archives may be created from a background thread
+    if source is None:
+        source = os.curdir
+    if not os.path.isdir(source):
+        raise NotADirectoryError(f"'{source}' is not a directory")
+    if statistics is None:
+        statistics = ArchiveStatistics()
+
+    filename = target + ".zip"
+    archive_dir = os.path.dirname(filename)
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED,
+                         allowZip64=True) as zf:
+        zf.write(source, os.curdir)
+        for dirpath, dirnames, filenames in os.walk(source):
+            for name in sorted(dirnames):
+                path = os.path.join(dirpath, name)
+                zf.write(path, os.path.relpath(path, source))
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if not os.path.isfile(path):
+                    continue
+                add_file_to_archive(zf, path, os.path.relpath(path, source), checksums=checksums, fast_hash=fast_hash,
+                                    statistics=statistics, compress_all=compress_all)
 
     return filename
 
@@ -62,6 +244,7 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
     reporter_factory = Dependency(Reporter)
     automation_server_factory = Dependency(AutomationServerForHostingBuild)
     html_output_factory = Dependency(HtmlOutput)
+    deferred_deletion_factory = Dependency(DeferredDeletion)
 
     @staticmethod
     def define_arguments(argument_parser):
@@ -75,10 +258,30 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
                             help="By default all directories noted as artifacts are copied as .zip archives. "
                                  "This option turn archiving off to copy bare directories to artifact directory")
 
+        parser.add_argument("--background-artifacts", action="store_true", dest="background_artifacts",
+                            help="Start collecting 'artifacts' of a step in background as soon as this step "
+                                 "finishes successfully, instead of collecting all artifacts after the last step. "
+                                 "Please make sure artifacts are not modified by any subsequent steps")
+
+        parser.add_argument("--artifact-manifest", action="store_true", dest="artifact_manifest",
+                            help="Calculate SHA-256 checksums of all collected artifact files while copying or "
+                                 "archiving them, and store the checksums and file sizes "
+                                 "to 'ARTIFACTS_MANIFEST.json' in artifact directory")
+
+        parser.add_argument("--manifest-fast-hash", action="store_true", dest="manifest_fast_hash",
+                            help="Also add CRC32 checksums to artifact manifest. CRC32 is much faster to calculate, "
+                                 "but is only suitable for detecting changes, not for verifying integrity")
+
+        parser.add_argument("--compress-all-artifacts", action="store_true", dest="compress_all",
+                            help="Deflate every file when archiving artifacts. By default, files that are already "
+                                 "compressed (detected by file extension and by entropy of the first block) "
+                                 "are stored to archives without compression to save time")
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.reporter = self.reporter_factory()
         self.automation_server = self.automation_server_factory()
+        self.deferred_deletion = self.deferred_deletion_factory()
 
         self.artifact_list = []
         self.report_artifact_list = []
@@ -87,6 +290,11 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
         self.collected_report_artifacts = set()
 
         self.file_list = set()
+        self.background_executor: Optional[ThreadPoolExecutor] = None
+        self.background_artifacts: Dict[str, Future] = {}
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        self.manifest_lock = threading.Lock()
+        self.archive_statistics = ArchiveStatistics()
         self.artifact_dir = self.settings.artifact_dir
 
         if not self.artifact_dir:
@@ -138,7 +346,7 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
                         except OSError as e:
                             if "Is a directory" not in e.strerror:
                                 raise
-                            shutil.rmtree(matching_path)
+                            self.deferred_deletion.remove(matching_path)
                         self.out.log(f"Cleaned up '{matching_path}'")
                 elif not ignore_already_existing:
                     text = "Build artifacts, such as"
@@ -184,8 +392,7 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
                                                                     name, True, report_artifact_list,
                                                                     ignore_existing_artifacts)
 
-    def move_artifact(self, path, is_report=False):
-        self.out.log("Processing '" + path + "'")
+    def find_artifacts(self, path: str, is_report: bool = False) -> List[str]:
         matches = glob2.glob(path)
         if not matches:
             if not is_report:
@@ -195,45 +402,117 @@ class ArtifactCollector(ProjectDirectory, HasOutput, HasStructure):
                 raise CiException(text)
 
             self.out.log("No artifacts found.")
-
-        for matching_path in matches:
-            artifact_name = os.path.basename(matching_path)
-            destination = os.path.join(self.artifact_dir, artifact_name)
-            if not self.settings.no_archive:
-                try:
-                    make_big_archive(destination, matching_path)
-                    if is_report:
-                        artifact_path = self.automation_server.artifact_path(self.artifact_dir, artifact_name + ".zip")
-                        self.collected_report_artifacts.add(artifact_path)
-                    continue
-                except OSError:
-                    # Single file archiving is not implemented at the moment
-                    pass
+        return matches
+
+    def add_to_manifest(self, artifact_name: str, checksums: Optional[Dict[str, FileChecksum]]) -> None:
+        if checksums is None:
+            return
+        files = {name: checksum.to_dict() for name, checksum in checksums.items()}
+        with self.manifest_lock:
+            self.manifest[artifact_name] = {"files": files}
+
+    def copy_artifact(self, matching_path: str, is_report: bool = False) -> None:
+        artifact_name = os.path.basename(matching_path)
+        destination = os.path.join(self.artifact_dir, artifact_name)
+        fast_hash: bool = self.settings.manifest_fast_hash
+        checksums: Optional[Dict[str, FileChecksum]] = {} if self.settings.artifact_manifest else None
+        if not self.settings.no_archive:
             try:
-                distutils.dir_util.copy_tree(matching_path, destination)
-                if is_report:
-                    text = "'" + artifact_name + "' is not a file and cannot be reported as an artifact"
-                    self.out.log(text)
-            except distutils.errors.DistutilsFileError:
-                shutil.copyfile(matching_path, destination)
+                statistics = ArchiveStatistics()
+                make_big_archive(destination, matching_path, checksums=checksums, fast_hash=fast_hash,
+                                 statistics=statistics, compress_all=self.settings.compress_all)
+                with self.manifest_lock:
+                    self.archive_statistics.merge(statistics)
+                self.add_to_manifest(artifact_name + ".zip", checksums)
                 if is_report:
-                    artifact_path = self.automation_server.artifact_path(self.artifact_dir, artifact_name)
+                    artifact_path = self.automation_server.artifact_path(self.artifact_dir, artifact_name + ".zip")
                     self.collected_report_artifacts.add(artifact_path)
+                return
+            except OSError:
+                # Single file archiving is not implemented at the moment
+                if checksums is not None:
+                    checksums = {}  # files of the failed archive are not collected
+        if os.path.isdir(matching_path):
+            copy_directory(matching_path, destination, checksums=checksums, fast_hash=fast_hash)
+            self.add_to_manifest(artifact_name, checksums)
+            if is_report:
+                text = "'" + artifact_name + "' is not a file and cannot be reported as an artifact"
+                self.out.log(text)
+        else:
+            copy_file(matching_path, destination, checksums=checksums, fast_hash=fast_hash)
+            self.add_to_manifest(artifact_name, checksums)
+            if is_report:
+                artifact_path = self.automation_server.artifact_path(self.artifact_dir, artifact_name)
+                self.collected_report_artifacts.add(artifact_path)
+
+    def move_artifact(self, path, is_report=False):
+        self.out.log("Processing '" + path + "'")
+        for matching_path in self.find_artifacts(path, is_report):
+            self.copy_artifact(matching_path, is_report)
+
+    def move_artifact_silently(self, path: str) -> None:
+        # Is executed in background thread, so no logging is allowed here
+        for matching_path in self.find_artifacts(path):
+            self.copy_artifact(matching_path)
+
+    def collect_step_artifacts(self, step: Step) -> None:
+        if not self.settings.background_artifacts or not step.artifacts:
+            return
+        path = utils.parse_path(step.artifacts, self.settings.project_root)
+        if path not in self.artifact_list or path in self.background_artifacts:
+            return
+
+        if not self.background_executor:
+            self.background_executor = ThreadPoolExecutor(max_workers=1)
+        self.out.log("Collecting '" + os.path.basename(path) + "' in background")
+        self.background_artifacts[path] = self.background_executor.submit(self.move_artifact_silently, path)
+
+    def wait_for_artifact(self, path: str) -> None:
+        self.out.log("Processing '" + path + "' (started in background)")
+        self.background_artifacts[path].result()
 
     @make_block("Collecting artifacts", pass_errors=False)
     def collect_artifacts(self):
         self.reporter.add_block_to_report(self.structure.get_current_block())
         for path in self.report_artifact_list:
             name = "Collecting '" + os.path.basename(path) + "' for report"
+            if path in self.background_artifacts:
+                # Same destination must not be written from two threads at once
+                wait([self.background_artifacts[path]])
             self.structure.run_in_block(self.move_artifact, name, False, path, is_report=True)
         self.reporter.report_artifacts(list(self.collected_report_artifacts))
         for path in self.artifact_list:
             name = "Collecting '" + os.path.basename(path) + "'"
-            self.structure.run_in_block(self.move_artifact, name, False, path)
+            if path in self.background_artifacts:
+                self.structure.run_in_block(self.wait_for_artifact, name, False, path)
+            else:
+                self.structure.run_in_block(self.move_artifact, name, False, path)
+        if self.background_executor:
+            self.background_executor.shutdown()
+            self.background_executor = None
+        self.report_archive_statistics()
+        if self.settings.artifact_manifest:
+            self.structure.run_in_block(self.write_manifest, "Writing artifact manifest", False)
+
+    def report_archive_statistics(self) -> None:
+        statistics = self.archive_statistics
+        if not statistics.stored_files:
+            return
+        text = f"{statistics.stored_files} already compressed file(s) ({statistics.stored_bytes} bytes) " + \
+               "stored to archives without compression"
+        time_saved = statistics.estimate_time_saved()
+        if time_saved is not None:
+            text += f", estimated time saved: {time_saved:.1f} s"
+        self.out.log(text)
+
+    def write_manifest(self) -> None:
+        manifest_file = self.create_text_file("ARTIFACTS_MANIFEST.json")
+        json.dump({"artifacts": self.manifest}, manifest_file, indent=4, sort_keys=True)
+        manifest_file.close()
 
     def clean_artifacts_silently(self):
         try:
-            shutil.rmtree(self.artifact_dir)
+            self.deferred_deletion.remove(self.artifact_dir)
         except OSError:
             pass
         os.makedirs(self.artifact_dir)
@@ -1,29 +1,272 @@
+import bisect
 import glob
+import hashlib
 import json
 import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
-from typing import Dict, List, Optional, TextIO, Tuple
+from typing import Any, Dict, IO, Iterator, List, Optional, Set, Tuple, Union
 
-from ..configuration_support import Configuration
+from typing_extensions import TypedDict
+
+from ..analyzers.utils import CACHE_DIR_VARIABLE, ONLY_CHANGED_VARIABLE
+from ..configuration_support import Configuration, Step
 from .output import HasOutput
 from .project_directory import ProjectDirectory
 from . import artifact_collector, reporter
-from ..lib import utils
+from ..lib import diff, json_stream, utils
+from ..lib.ci_exception import CiException
 from ..lib.gravity import Dependency
+from ..lib.issue_baseline import Fingerprinter, IssueBaseline
 from ..lib.utils import make_block
 from .structure_handler import HasStructure
 
+RepoDiff = List[Tuple[Optional[str], Optional[str], Optional[str]]]
+
+# Result file of each code report step, same as '${CODE_REPORT_FILE}'; being part of the step environment,
+# it is kept when the step is combined with its parents
+REPORT_FILE_VARIABLE = "UNIVERSUM_CODE_REPORT_FILE"
+
+
+class ReportCounts(TypedDict):
+    found: bool
+    issues: int
+    known: int
+    unrelated: int
+    introduced: int
+    reported: int
+
+
+def read_lines(path: str) -> List[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.readlines()
+
+
+class ChangedLinesIndex:
+    """
+    Changed line intervals of each file in repository diff, for checking whether a code report issue
+    belongs to the change under review. Intervals of a file are calculated on the first request
+    and are looked up by binary search, so checking a large number of issues stays fast
+
+    :param project_root: directory the relative paths of the diff and of the reports are counted from
+    :param repo_diff: list of (relative path, path to changed file copy, path to original file) as returned
+                      by `MainVcs.revert_repository()`; original file is None for added files
+    """
+
+    def __init__(self, project_root: str, repo_diff: RepoDiff) -> None:
+        self.project_root: str = project_root
+        self.files: Dict[str, Tuple[str, Optional[str]]] = {}
+        # None stands for a file that is new as a whole
+        self.intervals: Dict[str, Optional[Tuple[List[int], List[int]]]] = {}
+
+        for relative, copied, absolute in repo_diff:
+            if relative is None or copied is None:  # deleted file: no lines to report issues to
+                continue
+            self.files[self.normalize(relative)] = (copied, absolute)
+
+    def normalize(self, path: str) -> str:
+        return os.path.normpath(os.path.join(self.project_root, path))
+
+    def has_file(self, path: str) -> bool:
+        return self.normalize(path) in self.files
+
+    def calculate_intervals(self, key: str) -> Optional[Tuple[List[int], List[int]]]:
+        copied, original = self.files[key]
+        if original is None or not os.path.exists(original):
+            return None
+        starts: List[int] = []
+        ends: List[int] = []
+        previous_end: int = 0
+        for match in diff.get_matching_blocks(read_lines(original), read_lines(copied)):
+            if match.b > previous_end:
+                starts.append(previous_end + 1)
+                ends.append(match.b)
+            previous_end = match.b + match.size
+        return starts, ends
+
+    def is_changed(self, path: str, line: Union[int, str]) -> bool:
+        key = self.normalize(path)
+        if key not in self.files:
+            return False
+        if key not in self.intervals:
+            self.intervals[key] = self.calculate_intervals(key)
+        intervals = self.intervals[key]
+        line = int(line)
+        if intervals is None or line < 1:  # issues not bound to a line belong to every changed file
+            return True
+        starts, ends = intervals
+        position = bisect.bisect_right(starts, line) - 1
+        return position >= 0 and line <= ends[position]
+
+
+class MergedReport:
+    """
+    Issues of all code reports, deduplicated and grouped by path. Issues are kept in a temporary
+    JSON lines file while reports are being read, and only digests of their keys and offsets are kept in memory,
+    so that outputs indexed by path can be written for reports that do not fit in memory:
+
+    * merged report: JSON object with total, per-analyzer and per-symbol issue counts,
+      and with lists of issues of each path in 'files'
+    * JSON lines report: one issue per line, sorted by path and line
+    * index of JSON lines report: same counts, and byte offset and issue count of each path in 'files',
+      for reading issues of a single path without parsing the whole report
+
+    >>> import io
+    >>> report = MergedReport()
+    >>> report.add("pylint", {"path": "b.py", "line": 2, "symbol": "invalid-name", "message": "Name"})
+    True
+    >>> report.add("pylint", {"path": "a.py", "line": 1, "symbol": "missing-docstring", "message": "Docstring"})
+    True
+    >>> report.add("mypy", {"path": "b.py", "line": 2, "symbol": "invalid-name", "message": "Name"})
+    False
+    >>> merged, lines, index = io.StringIO(), io.StringIO(), io.StringIO()
+    >>> report.write(merged, lines, index)
+    >>> json.loads(merged.getvalue())["files"]["b.py"]
+    [{'line': 2, 'symbol': 'invalid-name', 'message': 'Name', 'analyzer': 'pylint'}]
+    >>> json.loads(index.getvalue())["files"]["b.py"]
+    {'offset': 105, 'count': 1}
+    >>> json.loads(lines.getvalue()[105:].splitlines()[0])["path"]
+    'b.py'
+    >>> json.loads(index.getvalue())["symbols"]
+    {'invalid-name': 1, 'missing-docstring': 1}
+    """
+
+    def __init__(self) -> None:
+        self.storage: IO[bytes] = tempfile.TemporaryFile()  # pylint: disable = consider-using-with
+        self.offsets: Dict[str, List[int]] = {}
+        self.known_issues: Set[bytes] = set()
+        self.analyzers: Dict[str, int] = {}
+        self.symbols: Dict[str, int] = {}
+
+    def add(self, analyzer: str, issue: Dict[str, Any]) -> bool:
+        """
+        :return: False if the same issue was already added from this or another report
+        """
+        key = hashlib.sha1(json.dumps([issue.get("path"), str(issue.get("line")), issue.get("symbol"),
+                                       issue.get("message")]).encode("utf-8")).digest()
+        if key in self.known_issues:
+            return False
+        self.known_issues.add(key)
+        self.analyzers[analyzer] = self.analyzers.get(analyzer, 0) + 1
+        symbol = str(issue.get("symbol"))
+        self.symbols[symbol] = self.symbols.get(symbol, 0) + 1
+
+        self.offsets.setdefault(str(issue.get("path")), []).append(self.storage.seek(0, os.SEEK_END))
+        self.storage.write(json.dumps(dict(issue, analyzer=analyzer)).encode("utf-8") + b"\n")
+        return True
+
+    def read_issues(self, path: str) -> List[Dict[str, Any]]:
+        issues: List[Dict[str, Any]] = []
+        for offset in self.offsets[path]:
+            self.storage.seek(offset)
+            issues.append(json.loads(self.storage.readline()))
+
+        def line_number(issue: Dict[str, Any]) -> int:
+            try:
+                return int(issue.get("line", 0))
+            except (TypeError, ValueError):
+                return 0
+
+        issues.sort(key=line_number)
+        return issues
+
+    def write(self, merged: IO[str], lines: IO[str], index: IO[str]) -> None:
+        summary: Dict[str, Any] = {
+            "total": len(self.known_issues),
+            "analyzers": dict(sorted(self.analyzers.items())),
+            "symbols": dict(sorted(self.symbols.items()))
+        }
+        merged.write("{\n" + "".join(f"    {json.dumps(key)}: {json.dumps(value)},\n"
+                                      for key, value in summary.items()) + '    "files": {')
+        files: Dict[str, Dict[str, int]] = {}
+        offset: int = 0
+        for number, path in enumerate(sorted(self.offsets)):
+            issues = self.read_issues(path)
+            files[path] = {"offset": offset, "count": len(issues)}
+            for issue in issues:
+                line = json.dumps(issue) + "\n"
+                lines.write(line)
+                offset += len(line.encode("utf-8"))
+                del issue["path"]
+            merged.write(("\n" if not number else ",\n") + f"        {json.dumps(path)}: {json.dumps(issues)}")
+        merged.write("\n    }\n}" if files else "}\n}")
+        json.dump(dict(summary, files=files), index, indent=4)
+
+    def close(self) -> None:
+        self.storage.close()
+
 
 class CodeReportCollector(ProjectDirectory, HasOutput, HasStructure):
     reporter_factory = Dependency(reporter.Reporter)
     artifacts_factory = Dependency(artifact_collector.ArtifactCollector)
 
+    @staticmethod
+    def define_arguments(argument_parser):
+        parser = argument_parser.get_or_create_group("Result reporting")
+
+        parser.add_argument("--code-report-baseline", dest="code_report_baseline", metavar="BASELINE_FILE",
+                            help="File with fingerprints of known code report issues, that are not reported "
+                                 "to code review system. Can be created by 'code-report-baseline' command")
+        parser.add_argument("--code-report-cache-dir", dest="code_report_cache_dir", metavar="CODE_REPORT_CACHE_DIR",
+                            help="Persistent directory for analysis results of the original sources, that code "
+                                 "report steps are repeated on to calculate the diff. Analyzers supporting "
+                                 "'--cache-dir' only check the files changed since the previous builds")
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.artifacts: artifact_collector.ArtifactCollector = self.artifacts_factory()
         self.reporter: reporter.Reporter = self.reporter_factory()
         self.report_path: str = ""
-        self.repo_diff: Optional[List[Tuple[Optional[str], Optional[str], Optional[str]]]]
+        self.repo_diff: Optional[RepoDiff] = None
+        self.baseline: Optional[IssueBaseline] = None
+        self.fingerprinter: Optional[Fingerprinter] = None
+        # Directory the steps were repeated in, if their results for the original sources are available
+        self.base_directory: Optional[str] = None
+        self.changed_lines: Optional[ChangedLinesIndex] = None
+        self.merged_report: Optional[MergedReport] = None
+        # Results of the steps are processed one by one in this thread, if started before the build
+        self.worker: Optional[ThreadPoolExecutor] = None
+        # Result files of the steps, for the change and for the original sources, by the report they belong to
+        self.step_reports: Dict[str, str] = {}
+        # Steps report their results from the threads waiting for their processes
+        self.lock: threading.Lock = threading.Lock()
+        self.finished_reports: Set[str] = set()
+        self.processed_reports: Dict[str, 'Future[ReportCounts]'] = {}
+        self.send_errors: List[str] = []
+
+    def load_baseline(self) -> None:
+        path: str = utils.parse_path(self.settings.code_report_baseline, os.getcwd())
+        try:
+            self.baseline = IssueBaseline.load(path)
+        except (OSError, ValueError) as e:
+            raise CiException(f"Failed to load code report baseline: {e}") from e
+
+    def create_fingerprinter(self) -> Fingerprinter:
+        # Project root may contain original sources at this point, so changed files are read from their copies
+        replacements: Dict[str, str] = {}
+        for relative, copied, _ in self.repo_diff or []:
+            if relative is not None and copied is not None:
+                replacements[os.path.normpath(os.path.join(self.settings.project_root, relative))] = copied
+        return Fingerprinter(self.settings.project_root, replacements)
+
+    def get_base_report_file(self, report_file: str) -> str:
+        return os.path.join(self.report_path, "base", os.path.basename(report_file))
+
+    def load_base_issues(self, report_file: str) -> Optional[IssueBaseline]:
+        """
+        Issues found by the same step in the original sources, if the step was repeated there and succeeded
+        """
+        base_file: str = self.get_base_report_file(report_file)
+        if self.base_directory is None or not os.path.exists(base_file):
+            return None
+        fingerprinter = Fingerprinter(self.base_directory)
+        with open(base_file, encoding="utf-8") as f:
+            reader = json_stream.JsonArrayReader(f)
+            if not reader.start():
+                return None
+            return IssueBaseline(fingerprinter.fingerprint(issue) for issue in reader)
 
     def prepare_environment(self, project_config: Configuration) -> Configuration:
         afterall_steps: Configuration = Configuration()
@@ -34,39 +277,198 @@ class CodeReportCollector(ProjectDirectory, HasOutput, HasStructure):
                 continue
             if not self.report_path:
                 self.report_path = os.path.join(self.settings.project_root, "code_report_results")
-                if not os.path.exists(self.report_path):
-                    os.makedirs(self.report_path)
+                os.makedirs(os.path.join(self.report_path, "base"), exist_ok=True)
             temp_filename: str = "${CODE_REPORT_FILE}"
             name: str = utils.calculate_file_absolute_path(self.report_path, item.name) + ".json"
             actual_filename: str = os.path.join(self.report_path, name)
+            base_filename: str = self.get_base_report_file(actual_filename)
+            self.step_reports[actual_filename] = actual_filename
+            self.step_reports[base_filename] = actual_filename
 
+            # Steps repeated on original sources must not overwrite results for the change itself
+            afterall_item = deepcopy(item)
+            afterall_item.replace_string(temp_filename, base_filename)
+            afterall_item.environment = dict(afterall_item.environment, **{REPORT_FILE_VARIABLE: base_filename})
             item.replace_string(temp_filename, actual_filename)
-            afterall_steps += [deepcopy(item)]
+            item.environment = dict(item.environment, **{REPORT_FILE_VARIABLE: actual_filename})
+            afterall_steps += [afterall_item]
         return afterall_steps
 
+    @staticmethod
+    def get_base_file_diff(base_directory: str, repo_diff: RepoDiff) -> List[Dict[str, str]]:
+        """
+        Files of the change that exist both before and after it, in 'universum api file-diff' format;
+        added files are left out, as they are not present before the change, and deleted files,
+        as their issues can't be present in the report after the change
+
+        >>> repo_diff = [("a.py", "/tmp/a.py", "/src/a.py"), ("b.py", "/tmp/b.py", None), (None, None, "/src/c.py")]
+        >>> [entry["repo_path"] for entry in CodeReportCollector.get_base_file_diff("/src", repo_diff)]
+        ['a.py']
+        """
+        result: List[Dict[str, str]] = []
+        for relative, _, absolute in repo_diff:
+            if relative is not None and absolute is not None:
+                result.append({"action": "modify", "repo_path": os.path.relpath(absolute, base_directory),
+                               "local_path": absolute})
+        return result
+
+    def prepare_base_analysis(self, afterall_configs: Configuration, repo_diff: Optional[RepoDiff],
+                              base_directory: str, background: bool = False) -> None:
+        """
+        Set up the steps repeated on the original sources: analyzers supporting '--only-changed' only check
+        the files of the change, and analyzers supporting '--cache-dir' use the persistent cache, if set.
+        Original sources may be placed to a separate directory instead of the project root; working directories
+        of the steps are moved there, so the steps must refer to the sources by relative paths.
+        With `background`, the steps are marked to be executed in background along with the build steps
+        """
+        variables: Dict[str, str] = {}
+        if repo_diff is not None:
+            diff_file: str = os.path.join(self.report_path, "base", "file_diff.json")
+            with open(diff_file, "w", encoding="utf-8") as f:
+                json.dump(self.get_base_file_diff(base_directory, repo_diff), f, indent=4)
+            variables[ONLY_CHANGED_VARIABLE] = diff_file
+        if self.settings.code_report_cache_dir:
+            variables[CACHE_DIR_VARIABLE] = utils.parse_path(self.settings.code_report_cache_dir, os.getcwd())
+        self.base_directory = base_directory
+        moved: bool = os.path.abspath(base_directory) != os.path.abspath(self.settings.project_root)
+        for item in afterall_configs.configs:
+            item.environment = dict(item.environment, **variables)
+            item.background = item.background or background
+            if moved:
+                item.directory = utils.parse_path(utils.strip_path_start(item.directory.rstrip("/")), base_directory)
+
+    def prepare_processing(self) -> None:
+        # Empty diff means there is no change to compare to, same as with '--no-diff'
+        if self.repo_diff:
+            self.changed_lines = ChangedLinesIndex(self.settings.project_root, self.repo_diff)
+        if self.settings.code_report_baseline:
+            self.load_baseline()
+        if self.baseline is not None or self.base_directory is not None:
+            self.fingerprinter = self.create_fingerprinter()
+        self.merged_report = MergedReport()
+
+    def start_incremental_processing(self, repo_diff: Optional[RepoDiff]) -> None:
+        """
+        Process the results of each code report step as soon as the step finishes, so that the issues are
+        sent to review without waiting for the rest of the build. Only possible when the changed lines
+        are known before the build, i.e. the diff is not calculated or the original sources are prepared in advance
+        """
+        self.repo_diff = repo_diff
+        self.prepare_processing()
+        self.worker = ThreadPoolExecutor(max_workers=1)
+
+    def report_step_results(self, step: Step) -> None:
+        """
+        Called when the process of the step exits, whatever the exit code is, as analyzers fail when they find
+        issues. If the steps are repeated on the original sources, results for the change are only processed
+        when the results for the original sources are also ready
+        """
+        path: Optional[str] = step.environment.get(REPORT_FILE_VARIABLE)
+        if path is None or path not in self.step_reports:
+            return
+        report_file: str = self.step_reports[path]
+        with self.lock:
+            if self.worker is None:
+                return
+            if os.path.exists(path):
+                self.finished_reports.add(path)
+            if report_file in self.finished_reports and report_file not in self.processed_reports and \
+                    (self.base_directory is None or self.get_base_report_file(report_file) in self.finished_reports):
+                self.processed_reports[report_file] = self.worker.submit(self.read_report_and_send, report_file)
+
+    def read_report_and_send(self, report_file: str) -> ReportCounts:
+        counts: ReportCounts = self.read_report(report_file)
+        # Issues that failed to be sent are still counted and written to the merged report
+        try:
+            self.reporter.report_code_report_comments()
+        except Exception as e:  # pylint: disable=broad-except
+            self.send_errors.append(f"Failed to send issues of '{os.path.basename(report_file)}' "
+                                    f"to code review system: {e}")
+        return counts
+
     @make_block("Processing code report results")
     def report_code_report_results(self) -> None:
         reports: List[str] = glob.glob(self.report_path + "/*.json")
-        for report_file in reports:
-            with open(report_file, "r") as f:
-                text: str = f.read()
-                report: Optional[List[Dict[str, str]]] = None
-                if text:
-                    report = json.loads(text)
-
-            json_file: TextIO = self.artifacts.create_text_file("Static_analysis_report.json")
-            json_file.write(json.dumps(report, indent=4))
-
-            if report:
-                for result in report:
-                    text = result["symbol"] + ": " + result["message"]
-                    self.reporter.code_report(result["path"], {"message": text, "line": result["line"]})
-
-            if report:
-                text = str(len(report)) + " issues"
-                self.out.log_stderr("Found " + text)
-                self.out.report_build_status(os.path.splitext(os.path.basename(report_file))[0] + ": " + text)
-            elif report == []:
-                self.out.log("Issues not found.")
-            else:  # if nothing was written to file
-                self.out.log_stderr("There are no results in code report file. Something went wrong.")
+        with self.lock:
+            worker: Optional[ThreadPoolExecutor] = self.worker
+            self.worker = None
+        if worker is not None:
+            worker.shutdown()
+        else:
+            self.prepare_processing()
+        try:
+            counts: Dict[str, ReportCounts] = {}
+            for report_file in reports:
+                if report_file in self.processed_reports:
+                    counts[report_file] = self.processed_reports[report_file].result()
+                else:
+                    counts[report_file] = self.read_report(report_file)
+            for report_file in reports:
+                self.log_report_counts(report_file, counts[report_file])
+            for error in self.send_errors:
+                self.out.log_stderr(error)
+            if reports and self.merged_report is not None:
+                with self.artifacts.create_text_file("Static_analysis_report.json") as merged, \
+                        self.artifacts.create_text_file("Static_analysis_report.jsonl") as lines, \
+                        self.artifacts.create_text_file("Static_analysis_report_index.json") as index:
+                    self.merged_report.write(merged, lines, index)
+        finally:
+            if self.merged_report is not None:
+                self.merged_report.close()
+
+    def read_report(self, report_file: str) -> ReportCounts:
+        analyzer: str = os.path.splitext(os.path.basename(report_file))[0]
+        counts = ReportCounts(found=False, issues=0, known=0, unrelated=0, introduced=0, reported=0)
+        if self.merged_report is None:
+            return counts
+        base_issues: Optional[IssueBaseline] = None
+        if self.changed_lines is not None:
+            base_issues = self.load_base_issues(report_file)
+
+        # Issues are passed to reporter and merged report as soon as they are read, for huge reports to fit in memory
+        with open(report_file, encoding="utf-8") as f:
+            reader = json_stream.JsonArrayReader(f)
+            counts["found"] = reader.start()
+            for result in reader:
+                counts["issues"] += 1
+                self.merged_report.add(analyzer, result)
+                fingerprint: str = self.fingerprinter.fingerprint(result) if self.fingerprinter else ""
+                if self.baseline is not None and self.baseline.match(fingerprint):
+                    counts["known"] += 1
+                    continue
+                if self.changed_lines is not None and \
+                        not self.changed_lines.is_changed(result["path"], result["line"]):
+                    # Issues outside changed lines of changed files are only reported if the change introduced them
+                    if base_issues is None or not self.changed_lines.has_file(result["path"]) or \
+                            base_issues.match(fingerprint):
+                        counts["unrelated"] += 1
+                        continue
+                    counts["introduced"] += 1
+                counts["reported"] += 1
+                text = result["symbol"] + ": " + result["message"]
+                self.reporter.code_report(result["path"], {"message": text, "line": result["line"]})
+        return counts
+
+    def log_report_counts(self, report_file: str, counts: ReportCounts) -> None:
+        analyzer: str = os.path.splitext(os.path.basename(report_file))[0]
+        issue_count: int = counts["issues"]
+        known_count: int = counts["known"]
+        reported_count: int = counts["reported"]
+
+        if known_count:
+            self.out.log(f"{known_count} of {issue_count} issues are skipped as known by baseline")
+        if self.changed_lines is not None and issue_count - known_count:
+            self.out.log(f"{counts['unrelated']} of {issue_count - known_count} issues "
+                         "are skipped as not related to changed lines")
+        if counts["introduced"]:
+            self.out.log(f"{counts['introduced']} issues outside changed lines are reported, "
+                         "as they are not found in the original sources")
+
+        if reported_count:
+            text = str(reported_count) + " issues"
+            self.out.log_stderr("Found " + text)
+            self.out.report_build_status(analyzer + ": " + text)
+        elif counts["found"]:
+            self.out.log("Issues not found.")
+        else:  # if nothing was written to file
+            self.out.log_stderr("There are no results in code report file. Something went wrong.")
@@ -0,0 +1,125 @@
+from typing import Optional
+import errno
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+
+from ..lib import utils
+from .output import HasOutput
+
+__all__ = [
+    "DeferredDeletion"
+]
+
+# Trash directory is set by user, so only this subdirectory, marked as created by Universum, is ever cleaned
+DELETION_DIRECTORY = "universum_deferred_deletion"
+MARKER_FILE = ".universum_trash"
+
+# Executed by a detached interpreter, so that deletion outlives the current run; only the entries
+# moved by 'DeferredDeletion.remove()' are deleted, including the ones that appear while deleting
+# (from the same or other runs)
+DELETION_SCRIPT = """
+import os, re, shutil, sys
+deletion_dir = sys.argv[1]
+if not os.path.isfile(os.path.join(deletion_dir, sys.argv[2])):
+    sys.exit(1)
+previous_entries = None
+while True:
+    try:
+        entries = {entry for entry in os.listdir(deletion_dir) if re.search(r"\\.[0-9a-f]{32}$", entry)}
+    except OSError:
+        break
+    if not entries or entries == previous_entries:
+        break  # either done, or nothing can be deleted and there is no need to loop forever
+    previous_entries = entries
+    for entry in entries:
+        path = os.path.join(deletion_dir, entry)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+"""
+
+
+class DeferredDeletion(HasOutput):
+    @staticmethod
+    def define_arguments(argument_parser):
+        parser = argument_parser.get_or_create_group("Configuration execution")
+
+        parser.add_argument("--deferred-deletion", action="store_true", dest="deferred_deletion",
+                            help="Instead of deleting copied sources and cleaned artifacts in place, move them "
+                                 "to trash directory and delete them in a detached background process. "
+                                 "Deletion not finished by previous run is resumed by the next one")
+
+        parser.add_argument("--trash-dir", dest="trash_dir", metavar="TRASH_DIR",
+                            help="Directory to move deleted files to when '--deferred-deletion' is used. "
+                                 "Should be located on the same file system as project root and artifact directory. "
+                                 "Default is '.universum_trash' in current directory. Only the files moved to "
+                                 f"'{DELETION_DIRECTORY}' subdirectory of it by Universum are deleted")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enabled = self.settings.deferred_deletion
+        if self.settings.trash_dir:
+            self.trash_dir = utils.parse_path(self.settings.trash_dir, os.getcwd())
+        else:
+            self.trash_dir = os.path.join(os.getcwd(), ".universum_trash")
+        self.deletion_dir = os.path.join(self.trash_dir, DELETION_DIRECTORY)
+        self.deletion_process: Optional[subprocess.Popen] = None
+
+        if self.enabled and os.path.isdir(self.deletion_dir):
+            if self.is_owned():
+                self.start_deletion()
+            else:
+                self.out.log(f"Deferred deletion is not resumed, as '{self.deletion_dir}' is not created by Universum")
+
+    def is_owned(self) -> bool:
+        return os.path.isfile(os.path.join(self.deletion_dir, MARKER_FILE))
+
+    def prepare_deletion_dir(self) -> bool:
+        """
+        :return: False if the directory already exists, but is not created by Universum
+        """
+        if os.path.isdir(self.deletion_dir):
+            return self.is_owned()
+        os.makedirs(self.deletion_dir)
+        with open(os.path.join(self.deletion_dir, MARKER_FILE), "w", encoding="utf-8"):
+            pass
+        return True
+
+    def start_deletion(self) -> None:
+        # A running deleter will also pick up newly added entries
+        if self.deletion_process and self.deletion_process.poll() is None:
+            return
+        self.deletion_process = subprocess.Popen(  # pylint: disable = consider-using-with
+            [sys.executable, "-c", DELETION_SCRIPT, self.deletion_dir, MARKER_FILE],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    def remove(self, path: str) -> None:
+        """
+        Delete the directory tree, raising OSError the same way as 'shutil.rmtree' does
+        if the tree cannot be deleted or does not exist
+        """
+        if not self.enabled:
+            shutil.rmtree(path)
+            return
+
+        if not self.prepare_deletion_dir():
+            self.out.log(f"'{path}' is deleted in place, as '{self.deletion_dir}' is not created by Universum")
+            shutil.rmtree(path)
+            return
+        # Renaming within one file system is atomic: the path is free for reuse immediately
+        target = os.path.join(self.deletion_dir, f"{os.path.basename(os.path.normpath(path))}.{uuid.uuid4().hex}")
+        try:
+            os.rename(path, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.rmtree(path)
+            return
+        self.start_deletion()
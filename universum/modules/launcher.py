@@ -165,6 +165,8 @@ class RunningStep:
                  out: Output,
                  fail_block: Callable[[str], None],
                  send_tag: Callable[[str], Response],
+                 collect_artifacts: Callable[[configuration_support.Step], None],
+                 report_results: Callable[[configuration_support.Step], None],
                  log_file: Optional[TextIO],
                  working_directory: str,
                  additional_environment: Dict[str, str],
@@ -174,6 +176,8 @@ class RunningStep:
         self.out: Output = out
         self.fail_block: Callable[[str], None] = fail_block
         self.send_tag = send_tag
+        self.collect_artifacts = collect_artifacts
+        self.report_results = report_results
         self.file: Optional[TextIO] = log_file
         self.working_directory: str = working_directory
 
@@ -216,7 +220,8 @@ class RunningStep:
                                 _env=self.environment,
                                 _bg=self._is_background,
                                 _out=self.handle_stdout,
-                                _err=self.handle_stderr)
+                                _err=self.handle_stderr,
+                                _done=self.handle_exit)
 
         log_cmd = utils.trim_and_convert_to_unicode(self.process.ran)
         self.out.log_external_command(log_cmd)
@@ -242,6 +247,12 @@ class RunningStep:
         else:
             self.out.log_stderr(line)
 
+    def handle_exit(self, _process: sh.RunningCommand, _success: bool, _exit_code: int) -> None:
+        # Called by the thread waiting for the process, so the results of background steps are reported
+        # as soon as they are ready; results are reported even if the step fails, as analyzers exit with error
+        # when they find issues
+        self.report_results(self.configuration)
+
     def add_tag(self, tag: str) -> None:
         if not tag:
             return
@@ -280,6 +291,7 @@ class RunningStep:
                 raise StepException()
 
             self.add_tag(self.configuration.pass_tag)
+            self.collect_artifacts(self.configuration)
         finally:
             self.handle_stdout()
             if self.file:
@@ -406,12 +418,17 @@ class Launcher(ProjectDirectory, HasOutput, HasStructure, HasErrorState):
 
         additional_environment = self.api_support.get_environment_settings()
         return RunningStep(item, self.out, fail_block, self.server.add_build_tag,
-                    log_file, working_directory, additional_environment, item.background)
+                           self.artifacts.collect_step_artifacts, self.code_report_collector.report_step_results,
+                           log_file, working_directory, additional_environment, item.background)
 
     def launch_custom_configs(self, custom_configs: configuration_support.Configuration) -> None:
         self.structure.execute_step_structure(custom_configs, self.create_process)
 
     @make_block("Executing build steps")
-    def launch_project(self) -> None:
+    def launch_project(self, background_configs: Optional[configuration_support.Configuration] = None) -> None:
         self.reporter.add_block_to_report(self.structure.get_current_block())
-        self.structure.execute_step_structure(self.project_config, self.create_process)
+        configs: configuration_support.Configuration = self.project_config
+        if background_configs is not None:
+            # Background steps are started first, and are waited for after the last build step
+            configs = background_configs + configs
+        self.structure.execute_step_structure(configs, self.create_process)
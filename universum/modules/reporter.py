@@ -91,6 +91,18 @@ class Reporter(HasOutput, HasStructure):
     def code_report(self, path, message):
         self.code_report_comments[path].append(message)
 
+    def report_code_report_comments(self):
+        """
+        Send the code report comments collected so far without waiting for the build result;
+        the sent comments are not repeated along with the build result
+        """
+        if not self.observers or not self.code_report_comments:
+            return
+        comments = self.code_report_comments
+        self.code_report_comments = defaultdict(list)
+        for observer in self.observers:
+            observer.code_report_to_review(comments)
+
     @make_block("Reporting build result", pass_errors=False)
     def report_build_result(self):
         if self.report_initialized is False:
@@ -1,7 +1,7 @@
-import shutil
-
+from ..deferred_deletion import DeferredDeletion
 from ..error_state import HasErrorState
 from ...lib.ci_exception import CiException
+from ...lib.gravity import Dependency
 from ...lib.utils import make_block
 from ..project_directory import ProjectDirectory
 
@@ -16,9 +16,11 @@ class BaseVcs(ProjectDirectory):
     """
     Base class for VCS drivers
     """
+    deferred_deletion_factory = Dependency(DeferredDeletion)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.deferred_deletion = self.deferred_deletion_factory()
         self.repo_status = u""
         self.sources_need_cleaning = False
 
@@ -31,7 +33,7 @@ class BaseVcs(ProjectDirectory):
     @make_block("Cleaning copied sources", pass_errors=False)
     def clean_sources(self):
         try:
-            shutil.rmtree(self.settings.project_root)
+            self.deferred_deletion.remove(self.settings.project_root)
         except OSError as e:
             text = f"{e}\n"
             text += "\nPossible reasons of this error:" + \
@@ -59,6 +61,27 @@ class BaseDownloadVcs(BaseVcs, HasErrorState):
     def copy_cl_files_and_revert(self):
         raise NotImplementedError
 
+    def supports_base_directory(self):  # pylint: disable=no-self-use
+        """
+        Whether `prepare_base_directory()` can be used for the current change
+        """
+        return False
+
+    def prepare_base_directory(self):
+        """
+        Place the sources before the change to a separate directory, leaving the project root intact, so that
+        the original sources can be analysed while the build steps are still running on the change.
+        Returns the same file diff as `copy_cl_files_and_revert()`
+        """
+        raise NotImplementedError
+
+    def get_base_directory(self):
+        """
+        Directory with the sources before the change, after calling `copy_cl_files_and_revert()`
+        or `prepare_base_directory()`
+        """
+        return self.settings.project_root
+
     def calculate_file_diff(self):
         raise NotImplementedError
 
@@ -149,11 +149,10 @@ class GerritMainVcs(ReportObserver, GerritVcs, git_vcs.GitMainVcs):
 
         return False
 
-    def calculate_file_diff(self):
+    def get_reference_commit(self):
         review_description = self._get_patch_set_description("commit:" + self.commit_id)
         target_branch = review_description["branch"]
-        reference_commit = self.repo.git.merge_base(target_branch, self.commit_id)
-        return self._diff_against_reference_commit(str(reference_commit))
+        return str(self.repo.git.merge_base(target_branch, self.commit_id))
 
     def code_report_to_review(self, report):
         # git show returns string, each file separated by \n,
@@ -2,6 +2,8 @@
 import glob
 import importlib
 import os
+import shutil
+import tempfile
 
 from .base_vcs import BaseVcs, BaseDownloadVcs, BasePollVcs, BaseSubmitVcs
 from ..error_state import HasErrorState
@@ -119,6 +121,7 @@ class GitMainVcs(GitVcs, BaseDownloadVcs):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.checkout_id = None
+        self.base_directory = None
 
     @make_block("Checking out")
     @catch_git_exception()
@@ -178,8 +181,77 @@ class GitMainVcs(GitVcs, BaseDownloadVcs):
 
         return result
 
+    def get_reference_commit(self):
+        """
+        Commit the checked change is compared to; for plain git the change consists of cherry-picked commits
+        """
+        return self.checkout_id
+
+    def get_base_commit(self):
+        """
+        Commit with the sources before the change, that are checked out to be analyzed again
+        """
+        return self.get_reference_commit()
+
     def calculate_file_diff(self):
-        return self._diff_against_reference_commit(self.checkout_id)
+        return self._diff_against_reference_commit(self.get_reference_commit())
+
+    def copy_cl_files_and_revert(self):
+        return self.prepare_base_directory()
+
+    def supports_base_directory(self):
+        return True
+
+    @make_block("Checking out reference commit")
+    @catch_git_exception()
+    def prepare_base_directory(self):
+        """
+        Sources before the change are checked out to a separate worktree next to the project root: the worktree
+        shares the repository objects, so nothing is cloned again, and the changed sources are left in place
+        """
+        reference = self.get_base_commit()
+        project_root = os.path.abspath(self.settings.project_root)
+        prefix = os.path.basename(project_root) + "_base_"
+        self.remove_stale_worktrees(os.path.join(os.path.dirname(project_root), prefix))
+        self.base_directory = tempfile.mkdtemp(prefix=prefix, dir=os.path.dirname(project_root))
+        self.out.log(f"Checking out '{reference}' to '{self.base_directory}'...")
+        try:
+            self.repo.git.worktree("add", "--detach", self.base_directory, reference)
+        except git.exc.GitCommandError:
+            self.remove_base_worktree()
+            raise
+
+        result = []
+        for entry in self._diff_against_reference_commit(reference):
+            relative = os.path.relpath(entry["local_path"], project_root)
+            original = os.path.join(self.base_directory, entry["repo_path"])
+            if entry["action"] == "delete":
+                result.append((None, None, original))
+            elif entry["action"] in ("add", "copy"):
+                result.append((relative, entry["local_path"], None))
+            else:
+                result.append((relative, entry["local_path"], original))
+        return result
+
+    def remove_stale_worktrees(self, prefix):
+        """
+        Worktrees are only removed in 'Finalizing' step, so the ones left by the runs that failed before it
+        or were not finalized are removed before creating a new one
+        """
+        for path in glob.glob(glob.escape(prefix) + "*"):
+            if os.path.isfile(os.path.join(path, ".git")):  # worktrees contain '.git' file instead of directory
+                self.out.log(f"Removing worktree '{path}' left by previous run...")
+                shutil.rmtree(path, ignore_errors=True)
+        self.repo.git.worktree("prune")
+
+    def get_base_directory(self):
+        return self.base_directory or self.settings.project_root
+
+    @catch_git_exception()
+    def remove_base_worktree(self):
+        shutil.rmtree(self.base_directory, ignore_errors=True)
+        self.repo.git.worktree("prune")
+        self.base_directory = None
 
     @catch_git_exception()
     def prepare_repository(self):
@@ -188,6 +260,11 @@ class GitMainVcs(GitVcs, BaseDownloadVcs):
         if self.settings.cherrypick_id:
             self.cherry_pick()
 
+    def finalize(self):
+        if self.base_directory:
+            self.remove_base_worktree()
+        super().finalize()
+
 
 class GitSubmitVcs(GitVcs, BaseSubmitVcs, HasErrorState):
     @staticmethod
@@ -200,6 +200,17 @@ class GithubMainVcs(ReportObserver, git_vcs.GitMainVcs, GithubTokenWithInstallat
     def is_latest_version(self):  # pylint: disable=no-self-use
         return True
 
+    def get_base_commit(self):
+        # Original sources are taken from the point where the checked commit branched off the default branch
+        # of the repository, while the file diff is still calculated against the checked commit
+        try:
+            return str(self.repo.git.merge_base("origin/HEAD", self.checkout_id))
+        except git_vcs.git.exc.GitCommandError:
+            # E.g. 'origin/HEAD' is not set, or the history is too short to reach the merge base
+            self.out.log("Failed to find where the checked commit branched off the default branch, "
+                         "only the checked commit is compared")
+            return super().get_base_commit()
+
     def _report(self):
         repo_path = str(urllib.parse.urlsplit(self.settings.repo).path).rsplit(".git", 1)[0]
         check_url = self.settings.api_url + "repos" + repo_path + "/check-runs/" + self.settings.check_id
@@ -226,6 +237,8 @@ class GithubMainVcs(ReportObserver, git_vcs.GitMainVcs, GithubTokenWithInstallat
                                          annotation_level="warning"))
         self.request["output"]["annotations"] = comments
         self._report()
+        # Annotations are added to the ones already sent, so they must not be repeated by further updates
+        del self.request["output"]["annotations"]
 
     def report_start(self, report_text):
         self.request["started_at"] = get_time()
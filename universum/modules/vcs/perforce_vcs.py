@@ -4,6 +4,7 @@ from types import ModuleType
 import importlib
 import os
 import shutil
+import tempfile
 import time
 import warnings
 
@@ -325,6 +326,7 @@ class PerforceMainVcs(PerforceWithMappings, base_vcs.BaseDownloadVcs):
 
         self.unshelved_files: List[Dict[str, str]] = []
         self.diff_in_files: List[Tuple[Optional[str], Optional[str], Optional[str]]] = []
+        self.base_directory: Optional[str] = None
 
     def code_review(self):
         self.swarm = self.swarm_factory(self.settings.user, self.settings.password)
@@ -583,6 +585,58 @@ class PerforceMainVcs(PerforceWithMappings, base_vcs.BaseDownloadVcs):
                 self.diff_in_files.append((relative, copied, absolute))
         return self.diff_in_files
 
+    def supports_base_directory(self) -> bool:
+        return bool(self.shelve_cls)
+
+    @catch_p4exception()
+    def prepare_base_directory(self) -> List[Tuple[Optional[str], Optional[str], Optional[str]]]:
+        """
+        Original sources are placed to a separate directory next to the workspace root, without reverting
+        the workspace: all files not opened in the workspace are linked to the workspace ones, and the
+        original revisions of the opened files are printed from the server
+        """
+        if not self.shelve_cls:
+            raise NotImplementedError("Original sources are only placed separately for shelved changes")
+        opened: List[Dict[str, str]] = self.p4.run_opened()
+        client_root = os.path.abspath(self.client_root)
+        self.base_directory = tempfile.mkdtemp(prefix=os.path.basename(client_root) + "_base_",
+                                               dir=os.path.dirname(client_root))
+        self.out.log(f"Placing original sources to '{self.base_directory}'...")
+
+        def get_relative(item: Dict[str, str]) -> str:
+            return item["clientFile"].replace("//" + item["client"] + "/", "")
+
+        originals: Dict[str, str] = {}
+        result: List[Tuple[Optional[str], Optional[str], Optional[str]]] = []
+        for item in opened:
+            relative = get_relative(item)
+            if item["action"] in ["delete", "move/delete"]:
+                originals[relative] = item["depotFile"] + "#have"
+                if item["action"] == "delete":
+                    result.append((None, None, os.path.join(self.base_directory, relative)))
+            elif item["action"] in ["add", "branch"]:
+                result.append((relative, os.path.join(client_root, relative), None))
+            elif item["action"] == "move/add":
+                # Moved file is compared to its original location, printed as 'move/delete' item
+                original: Optional[str] = None
+                for local, depot in self.mappings_dict.items():
+                    if depot == item["movedFile"]:
+                        original = os.path.join(self.base_directory, os.path.relpath(local, client_root))
+                result.append((relative, os.path.join(client_root, relative), original))
+            else:
+                originals[relative] = item["depotFile"] + "#have"
+                result.append((relative, os.path.join(client_root, relative), os.path.join(self.base_directory, relative)))
+
+        utils.create_link_tree(client_root, self.base_directory, [get_relative(item) for item in opened])
+        for relative, revision in originals.items():
+            target = os.path.join(self.base_directory, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.p4.run_print("-q", "-o", target, revision)
+        return result
+
+    def get_base_directory(self):
+        return self.base_directory or self.settings.project_root
+
     def prepare_repository(self):
         self.connect()
         self.create_workspace()
@@ -634,6 +688,8 @@ class PerforceMainVcs(PerforceWithMappings, base_vcs.BaseDownloadVcs):
                 run(self.connect)
                 run(self.clean_workspace)
             run(self.disconnect)
+            if self.base_directory:
+                run(shutil.rmtree, self.base_directory, ignore_errors=True)
             run(super().finalize)
 
 
@@ -1,15 +1,14 @@
 from typing import Dict, List, Optional, TextIO, Tuple, Type, Union
 import json
-import shutil
-import sh
 
 from . import git_vcs, github_vcs, gerrit_vcs, perforce_vcs, local_vcs, base_vcs
 from .. import artifact_collector
 from ..api_support import ApiSupport
+from ..deferred_deletion import DeferredDeletion
 from ..error_state import HasErrorState
 from ..project_directory import ProjectDirectory
 from ..structure_handler import HasStructure
-from ...lib import utils
+from ...lib import file_listing
 from ...lib.gravity import Dependency
 from ...lib.utils import make_block
 
@@ -126,6 +125,7 @@ SubmitVcs: Type[ProjectDirectory] = create_vcs("submit")
 class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/issues/2477
     artifacts_factory = Dependency(artifact_collector.ArtifactCollector)
     api_support_factory = Dependency(ApiSupport)
+    deferred_deletion_factory = Dependency(DeferredDeletion)
     driver: base_vcs.BaseDownloadVcs
 
     @staticmethod
@@ -135,10 +135,23 @@ class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/i
         parser.add_argument("--report-to-review", action="store_true", dest="report_to_review", default=False,
                             help="Perform test build for code review system (e.g. Gerrit or Swarm).")
 
+        parser.add_argument("--file-list-mode", dest="file_list_mode", choices=["full", "digest", "none"],
+                            default="full",
+                            help="Content of the file list in 'REPOSITORY_STATE.txt' artifact: 'full' for "
+                                 "'ls -lR'-like listing of the project root (default), 'digest' for per-directory "
+                                 "totals and a hash of the whole tree, 'none' to skip the file list")
+        parser.add_argument("--file-list-depth", dest="file_list_depth", type=int, metavar="DEPTH",
+                            help="Maximum number of nested directory levels included into the file list; "
+                                 "unlimited by default")
+        parser.add_argument("--file-list-limit", dest="file_list_limit", type=int, metavar="ENTRIES",
+                            help="Maximum number of entries in the full file list, the rest of the list is cut; "
+                                 "unlimited by default")
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.artifacts: artifact_collector.ArtifactCollector = self.artifacts_factory()
         self.api_support: ApiSupport = self.api_support_factory()
+        self.deferred_deletion: DeferredDeletion = self.deferred_deletion_factory()
 
         if not self.settings.report_to_review:
             return
@@ -174,8 +187,13 @@ class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/i
 
         status_file.write(self.driver.get_repo_status())
 
-        status_file.write("\nFile list:\n\n")
-        status_file.write(utils.trim_and_convert_to_unicode(sh.ls("-lR", self.settings.project_root)) + "\n")
+        if self.settings.file_list_mode == "digest":
+            status_file.write("\nFile list digest:\n\n")
+            file_listing.write_file_digest(self.settings.project_root, status_file, self.settings.file_list_depth)
+        elif self.settings.file_list_mode != "none":
+            status_file.write("\nFile list:\n\n")
+            file_listing.write_file_list(self.settings.project_root, status_file,
+                                         self.settings.file_list_depth, self.settings.file_list_limit)
         status_file.close()
         self.calculate_diff_for_api()
 
@@ -188,7 +206,7 @@ class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/i
 
     def clean_sources_silently(self):
         try:
-            shutil.rmtree(self.settings.project_root)
+            self.deferred_deletion.remove(self.settings.project_root)
         except OSError:
             pass
 
@@ -196,3 +214,13 @@ class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/i
     def revert_repository(self) -> Optional[List[Tuple[Optional[str], Optional[str], Optional[str]]]]:
         diff = self.driver.copy_cl_files_and_revert()
         return diff
+
+    def supports_base_directory(self) -> bool:
+        return self.driver.supports_base_directory()
+
+    @make_block("Preparing original sources")
+    def prepare_base_directory(self) -> List[Tuple[Optional[str], Optional[str], Optional[str]]]:
+        return self.driver.prepare_base_directory()
+
+    def get_base_directory(self) -> str:
+        return self.driver.get_base_directory()